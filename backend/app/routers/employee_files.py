@@ -9,7 +9,7 @@ from ..db import get_db
 from ..models import EmployeeUploadedFile, EmployeeUploadedRow
 from ..schemas import UploadedFileListItem, UploadedFileDetail, DeleteRequest, DeleteResponse
 from ..auth import get_current_user, get_current_admin_user
-from ..services.employee_hierarchy import build_hierarchy_map, get_scope_options, _build_child_map
+from ..services.employee_hierarchy import build_hierarchy_map, get_scope_options, get_or_build_child_map
 
 router = APIRouter()
 
@@ -84,7 +84,7 @@ def get_organogram(
     hierarchy_map = build_hierarchy_map(db, employee_file_id)
     if not hierarchy_map:
         return []
-    child_map = _build_child_map(hierarchy_map)
+    child_map = get_or_build_child_map(hierarchy_map)
     out: List[OrganogramEntry] = []
     for parent_email in sorted(hierarchy_map.keys(), key=lambda e: (hierarchy_map[e].get("name") or e).lower()):
         row = hierarchy_map[parent_email]
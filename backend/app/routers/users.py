@@ -19,7 +19,7 @@ from ..services.employee_hierarchy import (
     scope_for_user,
     get_scope_options_for_user,
     scope_to_persist_for_user,
-    _build_child_map,
+    get_or_build_child_map,
     get_subordinate_emails,
     get_emails_and_codes_in_functions,
 )
@@ -205,7 +205,7 @@ def get_my_scope(
                 # direct_* left empty so frontend uses allowed_* (whole function), not direct reports only
             else:
                 # N-2, N-3, ...: self + subordinates only
-                child_map = _build_child_map(hierarchy_map)
+                child_map = get_or_build_child_map(hierarchy_map)
                 allowed_emails_set = get_subordinate_emails(hierarchy_map, child_map, current_user_hierarchy_key)
                 allowed_employee_emails = list(allowed_emails_set)
                 allowed_employee_codes = list({
@@ -1,5 +1,12 @@
-"""Build employee hierarchy (N, N-1, N-2) from Supervisor Name and Line Manager Employee ID."""
-from typing import Any, Dict, List, Optional
+"""
+Build employee hierarchy (N, N-1, N-2) from Supervisor Name and Line Manager Employee ID.
+
+All string fields in hierarchy rows (and in get_scope_options entries) are stored already stripped,
+so callers compare them directly instead of stripping again.
+"""
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
 from collections import deque
 
 from sqlalchemy.orm import Session
@@ -16,6 +23,9 @@ def _norm_employee_code(s: str) -> str:
     s = (s or "").strip()
     if not s:
         return ""
+    # Fast path: plain integer IDs like "11410" (same result as int(float(s)), without the round-trip)
+    if s.isascii() and s.isdigit():
+        return s.lstrip("0") or "0"
     s_lower = s.lower()
     # If it looks like a number (possibly with .0), strip trailing .0 for consistent lookup
     if s_lower.replace(".", "").replace(" ", "").isdigit():
@@ -52,13 +62,186 @@ def _get_cell(data: Dict[str, Any], *keys: str) -> str:
     return ""
 
 
+# Column names tried for each hierarchy field (order = preference; first non-empty wins)
+_HIERARCHY_CELL_KEYS: Dict[str, Tuple[str, ...]] = {
+    "email": ("Email (Official)", "Email (Offical)", "Email"),
+    "name": ("Employee Name", "Name", "Employee name"),
+    "employee_code": ("Employee Code", "Employee ID", "Emp Code", "Code"),
+    "function": ("Function",),
+    "department": ("Department",),
+    "company": ("Company Name", "Company", "Comapny Name", "Legal Entity", "Company Name (Legal)", "Entity"),
+    "supervisor_name": ("Supervisor Name", "Supervisor", "Line Manager Name", "Manager Name"),
+    "line_manager_employee_id": (
+        "Line Manager Employee ID", "Line Manager ID", "Line Manager Code", "Report To ID", "Manager ID",
+    ),
+}
+
+
+def _resolve_cell_keys(header: Tuple[str, ...], keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Data keys to try, in order, for the given candidate names: exact names first, then headers
+    matching case-insensitively + stripped. Same precedence as _get_cell, resolved once per header layout.
+    """
+    out = list(keys)
+    for k in keys:
+        n = _norm(k)
+        if n:
+            out.extend(dk for dk in header if dk not in out and _norm(dk) == n)
+    return tuple(out)
+
+
+def _get_resolved_cell(data: Dict[str, Any], candidates: Tuple[str, ...]) -> str:
+    """First non-empty stripped value among the resolved candidate keys."""
+    for k in candidates:
+        v = data.get(k)
+        if v is not None:
+            s = str(v).strip()
+            if s:
+                return s
+    return ""
+
+
+@dataclass(slots=True)
+class EmployeeRow:
+    """
+    One Employee List row in the hierarchy. Slotted (much smaller than a per-employee dict); also supports
+    row.get("function") / row["email"] so code written against the old dict rows keeps working.
+    _*_l fields are lowercased copies; _parent_key / _supervisor_name_l feed parent resolution.
+    """
+
+    email: str
+    name: str
+    employee_code: str
+    function: str
+    department: str
+    company: str
+    supervisor_name: str
+    line_manager_employee_id: str
+    source_file_id: Optional[int]
+    source_filename: str
+    _name_l: str
+    _code_l: str
+    _function_l: str
+    _department_l: str
+    _company_l: str
+    _parent_key: str
+    _supervisor_name_l: str
+    level: Optional[str] = None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _EMPLOYEE_ROW_FIELDS:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _EMPLOYEE_ROW_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in _EMPLOYEE_ROW_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+
+_EMPLOYEE_ROW_FIELDS = frozenset(f.name for f in fields(EmployeeRow))
+
+# Public field -> EmployeeRow field holding its lowercased copy
+_LOWER_FIELDS = {
+    "name": "_name_l",
+    "employee_code": "_code_l",
+    "function": "_function_l",
+    "department": "_department_l",
+    "company": "_company_l",
+    "supervisor_name": "_supervisor_name_l",
+}
+
+
+def _lower_field(row: Dict[str, Any], field: str) -> str:
+    """Stripped, lowercased value of a public field. EmployeeRow has it precomputed; plain dict rows are normalized."""
+    if type(row) is EmployeeRow:
+        return getattr(row, _LOWER_FIELDS[field])
+    return _norm(row.get(field))
+
+
+def _row_parent_key(row: Dict[str, Any]) -> str:
+    """Normalized Line Manager Employee ID of a row, as looked up in the parent index."""
+    if type(row) is EmployeeRow:
+        return row._parent_key
+    return _norm_employee_code(row.get("line_manager_employee_id") or "")
+
+
+class HierarchyMap(dict):
+    """
+    email_lower -> EmployeeRow (as returned by build_hierarchy_map), plus indexes derived while building.
+    func_index: function_lower -> (emails_set, codes_lower_set).
+    func_scope_cache: frozenset of function_lower -> get_emails_and_codes_in_functions result, so repeated
+    scope checks against the same map (several per request) reuse one result.
+    child_map: parent_email -> [child_emails], the same mapping _build_child_map computes.
+    subordinate_cache: email -> frozenset of self + transitive subordinates, filled lazily by
+    get_subordinate_emails so only emails that are actually asked for pay for the walk.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.func_index: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        self.func_scope_cache: Dict[FrozenSet[str], Tuple[FrozenSet[str], FrozenSet[str]]] = {}
+        self.child_map: Optional[Dict[str, List[str]]] = None
+        self.subordinate_cache: Dict[str, FrozenSet[str]] = {}
+
+
+# Level -> child level ("N" -> "N-1", "N-1" -> "N-2", ...); grows lazily, one entry per tree depth
+_NEXT_LEVEL: Dict[str, str] = {"N": "N-1"}
+
+
+def _next_level(level: str) -> str:
+    nxt = _NEXT_LEVEL.get(level)
+    if nxt is not None:
+        return nxt
+    parts = level.split("-")
+    nxt = "N-1"
+    if len(parts) >= 2:
+        try:
+            nxt = f"N-{int(parts[1]) + 1}"
+        except ValueError:
+            pass
+    _NEXT_LEVEL[level] = nxt
+    return nxt
+
+
+def _resolve_parents(email_to_row: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    """
+    Return email -> parent email (None if unresolved). Parent is found by Line Manager Employee ID
+    (normalized employee code or email), else by Supervisor Name. On duplicates, an employee code maps to
+    the last row that has it and a supervisor name maps to the first; an email always maps to itself.
+    """
+    # One index for both codes and emails: a normalized email is just the lowercased email
+    parent_index: Dict[str, str] = {}
+    name_to_email: Dict[str, str] = {}
+    for e, row in email_to_row.items():
+        code = row.get("employee_code")
+        if code:
+            parent_index[_norm_employee_code(code)] = e
+        n = _lower_field(row, "name")
+        if n and n not in name_to_email:
+            name_to_email[n] = e
+    for e in email_to_row:
+        parent_index[e.lower()] = e
+
+    return {
+        e: parent_index.get(_row_parent_key(row)) or name_to_email.get(_lower_field(row, "supervisor_name"))
+        for e, row in email_to_row.items()
+    }
+
+
 def build_hierarchy_map(
     db: Session,
     employee_file_id: Optional[int] = None,
-) -> Dict[str, Dict[str, Any]]:
+) -> HierarchyMap:
     """
-    Returns dict: email_lower -> { email, name, employee_code, function, department, level }.
+    Returns dict: email_lower -> EmployeeRow { email, name, employee_code, function, department, level, ... }.
     Level is "N", "N-1", "N-2", ... from org tree (roots = no line manager).
+    The result is a HierarchyMap, so it also carries func_index for get_emails_and_codes_in_functions.
     """
     if employee_file_id:
         files = db.query(EmployeeUploadedFile).filter(EmployeeUploadedFile.id == employee_file_id).all()
@@ -71,102 +254,108 @@ def build_hierarchy_map(
             .all()
         )
     if not files:
-        return {}
+        return HierarchyMap()
 
-    email_to_row: Dict[str, Dict[str, Any]] = {}
+    email_to_row = HierarchyMap()
+    # Rows of one upload share a header layout, so column resolution is done once per layout, not per cell
+    plans: Dict[Tuple[str, ...], Dict[str, Tuple[str, ...]]] = {}
     for f in files:
-        rows = db.query(EmployeeUploadedRow.data).filter(EmployeeUploadedRow.file_id == f.id).all()
+        # Stream only the data column in chunks (server-side cursor) instead of buffering every row
+        rows = (
+            db.query(EmployeeUploadedRow.data)
+            .filter(EmployeeUploadedRow.file_id == f.id)
+            .yield_per(1000)
+        )
+        source_file_id = getattr(f, "id", None)
+        source_filename = getattr(f, "filename", None) or ""
         for r in rows:
             data = r.data or {}
-            email = _get_cell(data, "Email (Official)", "Email (Offical)", "Email")
+            header = tuple(data)
+            plan = plans.get(header)
+            if plan is None:
+                plan = plans[header] = {
+                    field: _resolve_cell_keys(header, keys) for field, keys in _HIERARCHY_CELL_KEYS.items()
+                }
+            email = _get_resolved_cell(data, plan["email"])
             if not email:
                 continue
             email_lower = email.lower()
             # Function/Department/Company: try many possible column names (order = preference; first non-empty wins)
             # Department: prefer more specific (Sub Department, Team) so "Learning and Culture" shows over "Human Resources & Administration"
             # source_filename so UI can show which uploaded file this row came from (proves we read from employee list)
-            email_to_row[email_lower] = {
-                "email": email,
-                "name": _get_cell(data, "Employee Name", "Name", "Employee name"),
-                "employee_code": _get_cell(data, "Employee Code", "Employee ID", "Emp Code", "Code"),
-                "function": _get_cell(data, "Function"),
-                "department": _get_cell(data, "Department"),
-                "company": _get_cell(
-                    data,
-                    "Company Name", "Company", "Comapny Name", "Legal Entity", "Company Name (Legal)", "Entity",
-                ),
-                "supervisor_name": _get_cell(data, "Supervisor Name", "Supervisor", "Line Manager Name", "Manager Name"),
-                "line_manager_employee_id": _get_cell(
-                    data, "Line Manager Employee ID", "Line Manager ID", "Line Manager Code", "Report To ID", "Manager ID"
-                ),
-                "source_file_id": getattr(f, "id", None),
-                "source_filename": getattr(f, "filename", None) or "",
-            }
-
-    code_to_email: Dict[str, str] = {}
-    for e, v in email_to_row.items():
-        if v.get("employee_code"):
-            code_to_email[_norm_employee_code(v["employee_code"])] = e
-        code_to_email[e] = e
-
-    def parent_email(row: Dict[str, Any]) -> Optional[str]:
-        lm_id = (row.get("line_manager_employee_id") or "").strip()
-        sup_name = (row.get("supervisor_name") or "").strip()
-        if lm_id:
-            lm_norm = _norm_employee_code(lm_id)
-            if lm_norm and lm_norm in code_to_email:
-                return code_to_email[lm_norm]
-            if "@" in lm_id and lm_id.lower().strip() in email_to_row:
-                return lm_id.lower().strip()
-        if sup_name:
-            for emp, r2 in email_to_row.items():
-                if (r2.get("name") or "").strip().lower() == sup_name.lower():
-                    return emp
-        return None
-
-    email_to_parent: Dict[str, Optional[str]] = {}
+            # _*_l keys hold the lowercased value once so scope checks don't re-strip/lower per request
+            name = _get_resolved_cell(data, plan["name"])
+            employee_code = _get_resolved_cell(data, plan["employee_code"])
+            supervisor_name = _get_resolved_cell(data, plan["supervisor_name"])
+            line_manager_employee_id = _get_resolved_cell(data, plan["line_manager_employee_id"])
+            # Low-cardinality fields are interned so the map shares one string per distinct value
+            function = sys.intern(_get_resolved_cell(data, plan["function"]))
+            department = sys.intern(_get_resolved_cell(data, plan["department"]))
+            company = sys.intern(_get_resolved_cell(data, plan["company"]))
+            email_to_row[email_lower] = EmployeeRow(
+                email=email,
+                name=name,
+                employee_code=employee_code,
+                function=function,
+                department=department,
+                company=company,
+                supervisor_name=supervisor_name,
+                line_manager_employee_id=line_manager_employee_id,
+                source_file_id=source_file_id,
+                source_filename=source_filename,
+                _name_l=name.lower(),
+                _code_l=employee_code.lower(),
+                _function_l=sys.intern(function.lower()),
+                _department_l=sys.intern(department.lower()),
+                _company_l=sys.intern(company.lower()),
+                # Line manager ID normalized like codes (emails just lowercase), looked up in the parent index
+                _parent_key=_norm_employee_code(line_manager_employee_id),
+                _supervisor_name_l=supervisor_name.lower(),
+            )
+
+    email_to_parent = _resolve_parents(email_to_row)
     child_map: Dict[str, List[str]] = {}
-    for e, row in email_to_row.items():
-        p = parent_email(row)
-        email_to_parent[e] = p
+    for e, p in email_to_parent.items():
         if p and p in email_to_row:
             child_map.setdefault(p, []).append(e)
 
-    roots = [e for e in email_to_row if not email_to_parent.get(e) or email_to_parent[e] not in email_to_row]
-    if not roots:
-        roots = list(email_to_row.keys())
-
-    def next_level(level: str) -> str:
-        if level == "N":
-            return "N-1"
-        parts = level.split("-")
-        if len(parts) >= 2:
-            try:
-                n = int(parts[1])
-                return f"N-{n + 1}"
-            except ValueError:
-                pass
-        return "N-1"
+    # Seed BFS with roots (no parent, or parent not in the list); if every node has a parent (cycle), start from all
+    q: deque = deque()
+    for e, p in email_to_parent.items():
+        if not p or p not in email_to_row:
+            q.append((e, "N"))
+    if not q:
+        q.extend((e, "N") for e in email_to_row)
 
     level_map: Dict[str, str] = {}
-    q = deque((r, "N") for r in roots)
-    seen = set()
     while q:
         email_key, level = q.popleft()
-        if email_key in seen:
+        if email_key in level_map:
             continue
-        seen.add(email_key)
         level_map[email_key] = level
-        for child in child_map.get(email_key, []):
-            q.append((child, next_level(level)))
+        children = child_map.get(email_key)
+        if children:
+            child_level = _next_level(level)
+            for child in children:
+                q.append((child, child_level))
 
     for e in email_to_row:
         if e not in level_map:
             level_map[e] = "N-2"
 
-    # Add level to each row; also collect all functions and function->departments for scope
+    # Add level to each row; also index emails/codes by function for N-1 scope
+    email_to_row.child_map = child_map
+    func_index = email_to_row.func_index
     for e, row in email_to_row.items():
-        row["level"] = level_map.get(e)
+        row.level = level_map.get(e)
+        f = row._function_l
+        if f:
+            bucket = func_index.get(f)
+            if bucket is None:
+                bucket = func_index[f] = (set(), set())
+            bucket[0].add(e)
+            if row._code_l:
+                bucket[1].add(row._code_l)
 
     return email_to_row
 
@@ -175,57 +364,55 @@ def _build_child_map(hierarchy_map: Dict[str, Dict[str, Any]]) -> Dict[str, List
     """Build parent_email -> [child_emails] from hierarchy_map (for subordinate scope)."""
     if not hierarchy_map:
         return {}
-    code_to_email: Dict[str, str] = {}
-    for e, v in hierarchy_map.items():
-        if v.get("employee_code"):
-            code_to_email[_norm_employee_code(v["employee_code"])] = e
-        code_to_email[e.lower()] = e
-
-    def parent_email(row: Dict[str, Any]) -> Optional[str]:
-        lm_id = (row.get("line_manager_employee_id") or "").strip()
-        sup_name = (row.get("supervisor_name") or "").strip()
-        if lm_id:
-            lm_norm = _norm_employee_code(lm_id)
-            if lm_norm and lm_norm in code_to_email:
-                return code_to_email[lm_norm]
-            if "@" in lm_id and lm_id.lower() in hierarchy_map:
-                return lm_id.lower()
-        if sup_name:
-            sup_lower = sup_name.lower()
-            for emp, r2 in hierarchy_map.items():
-                if _norm(r2.get("name") or "") == sup_lower:
-                    return emp
-        return None
-
     child_map: Dict[str, List[str]] = {}
-    for e, row in hierarchy_map.items():
-        p = parent_email(row)
+    for e, p in _resolve_parents(hierarchy_map).items():
         if p and p in hierarchy_map:
             child_map.setdefault(p, []).append(e)
     return child_map
 
 
+def get_or_build_child_map(hierarchy_map: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Return the child map built alongside hierarchy_map if available, else build it."""
+    child_map = getattr(hierarchy_map, "child_map", None)
+    if child_map is not None:
+        return child_map
+    return _build_child_map(hierarchy_map)
+
+
 def get_emails_and_codes_in_functions(
     hierarchy_map: Dict[str, Dict[str, Any]],
     allowed_functions: List[str],
-) -> tuple[set, set]:
+) -> tuple[frozenset[str], frozenset[str]]:
     """
-    Return (emails_set, codes_set) for all employees whose function is in allowed_functions.
+    Return (emails, codes) frozensets for all employees whose function is in allowed_functions.
     Used for N-1: see all employees under their function, not just subordinates.
+    For a HierarchyMap the result is memoized per function set on that map (func_scope_cache), so it only
+    helps repeated calls within one request; each request builds a new map.
     """
     if not hierarchy_map or not allowed_functions:
-        return (set(), set())
-    func_set = {f.strip().lower() for f in allowed_functions if (f or "").strip()}
+        return (frozenset(), frozenset())
+    func_set = frozenset(f.strip().lower() for f in allowed_functions if (f or "").strip())
+    func_index = getattr(hierarchy_map, "func_index", None)
+    if func_index is not None:
+        cache = hierarchy_map.func_scope_cache
+        cached = cache.get(func_set)
+        if cached is None:
+            buckets = [func_index[f] for f in func_set if f in func_index]
+            cached = cache[func_set] = (
+                frozenset().union(*(b[0] for b in buckets)),
+                frozenset().union(*(b[1] for b in buckets)),
+            )
+        return cached
     emails = set()
     codes = set()
     for e, row in hierarchy_map.items():
-        f = (row.get("function") or "").strip().lower()
+        f = _lower_field(row, "function")
         if f and f in func_set:
             emails.add(e.lower())
-            code = (row.get("employee_code") or "").strip()
+            code = _lower_field(row, "employee_code")
             if code:
-                codes.add(code.lower())
-    return (emails, codes)
+                codes.add(code)
+    return (frozenset(emails), frozenset(codes))
 
 
 def get_subordinate_emails(
@@ -245,9 +432,14 @@ def get_subordinate_emails(
     if email_lower not in hierarchy_map:
         return {email_lower}
     row = hierarchy_map[email_lower]
-    level = (row.get("level") or "").strip()
+    level = row.get("level", "")
     if level == "N":
         return set(hierarchy_map.keys())
+    cache = getattr(hierarchy_map, "subordinate_cache", None)
+    if cache is not None:
+        cached = cache.get(email_lower)
+        if cached is not None:
+            return set(cached)
     out = {email_lower}
     q = deque([email_lower])
     while q:
@@ -256,9 +448,15 @@ def get_subordinate_emails(
             if child not in out:
                 out.add(child)
                 q.append(child)
+    if cache is not None:
+        cache[email_lower] = frozenset(out)
     return out
 
 
+# (allowed_codes, allowed_emails, allowed_departments, allowed_functions) meaning "no filter"
+_NO_FILTER: Tuple[None, None, None, None] = (None, None, None, None)
+
+
 def get_allowed_employee_codes_for_attendance(
     db: Session, user: Any
 ) -> tuple[Optional[set], Optional[set], Optional[set], Optional[set]]:
@@ -269,14 +467,13 @@ def get_allowed_employee_codes_for_attendance(
     N-1: returns all employees in user's function (not just subordinates).
     N-2 and below: returns self + subordinates only.
     """
-    if getattr(user, "role", None) == "admin":
-        return (None, None, None, None)
     level = (getattr(user, "data_scope_level", None) or "").strip()
-    if level == "N" or getattr(user, "role", None) == "N":
-        return (None, None, None, None)
+    match (getattr(user, "role", None), level):
+        case ("admin", _) | ("N", _) | (_, "N"):
+            return _NO_FILTER
     hierarchy_map = build_hierarchy_map(db, None)
     if not hierarchy_map:
-        return (None, None, None, None)
+        return _NO_FILTER
 
     # Explicit allowed_functions (user selected multiple functions): use only when NOT N-2/N-3/... so subordinates still work
     is_n2_or_deeper = level.startswith("N-") and level not in ("N", "N-1") if level else False
@@ -303,43 +500,43 @@ def get_allowed_employee_codes_for_attendance(
                 key = _e
                 break
     if not key:
-        return (None, None, None, None)
+        return _NO_FILTER
 
     # N-1: all employees in user's function (subordinates logic not applicable).
     # Return None for depts/funcs so file detail only filters by code/email (avoids excluding rows
     # when attendance file function/department names differ from Employee List).
     if level == "N-1":
         emp = hierarchy_map.get(key)
-        func = (emp.get("function") or "").strip() if emp else ""
+        func = emp.get("function", "") if emp else ""
         if not func:
-            return (None, None, None, None)
+            return _NO_FILTER
         allowed_emails_set, allowed_codes_set = get_emails_and_codes_in_functions(hierarchy_map, [func])
         if not allowed_emails_set and not allowed_codes_set:
-            return (None, None, None, None)
+            return _NO_FILTER
         return (allowed_codes_set, allowed_emails_set, None, None)
 
     # N-2, N-3, ...: self + subordinates only
-    child_map = _build_child_map(hierarchy_map)
-    allowed_emails_set = get_subordinate_emails(hierarchy_map, child_map, key)
+    child_map = get_or_build_child_map(hierarchy_map)
+    # Hierarchy keys are already lowercase, so the subordinate set is the email set as-is
+    emails = get_subordinate_emails(hierarchy_map, child_map, key)
     codes = set()
-    emails = set()
     departments = set()
     functions = set()
-    for e in allowed_emails_set:
-        emails.add(e.lower())
+    for e in emails:
         row = hierarchy_map.get(e)
-        if not row:
+        if row is None:
             continue
-        if (row.get("employee_code") or "").strip():
-            codes.add((row.get("employee_code") or "").strip().lower())
-        d = (row.get("department") or "").strip().lower()
+        code = _lower_field(row, "employee_code")
+        if code:
+            codes.add(code)
+        d = _lower_field(row, "department")
         if d:
             departments.add(d)
-        f = (row.get("function") or "").strip().lower()
+        f = _lower_field(row, "function")
         if f:
             functions.add(f)
     if not (codes or emails):
-        return (None, None, None, None)
+        return _NO_FILTER
     return (codes, emails, departments or None, functions or None)
 
 
@@ -368,15 +565,15 @@ def scope_for_user(
     if level == "N":
         return {"all": True, "allowed_functions": None, "allowed_departments": None, "data_scope_level": "N"}
 
-    func = (emp.get("function") or "").strip()
-    dept = (emp.get("department") or "").strip()
+    func = emp.get("function", "")
+    dept = emp.get("department", "")
 
     if level == "N-1":
         # All departments under this function
         depts_under_function = set()
         for row in hierarchy_map.values():
-            if (row.get("function") or "").strip() == func and (row.get("department") or "").strip():
-                depts_under_function.add((row.get("department") or "").strip())
+            if row.get("function", "") == func and row.get("department", ""):
+                depts_under_function.add(row.get("department", ""))
         return {
             "all": False,
             "allowed_functions": [func] if func else [],
@@ -410,9 +607,9 @@ def scope_to_persist_for_user(
     if not emp:
         return {"allowed_companies": [], "allowed_functions": [], "allowed_departments": []}
 
-    func = (emp.get("function") or "").strip()
-    dept = (emp.get("department") or "").strip()
-    company = (emp.get("company") or "").strip()
+    func = emp.get("function", "")
+    dept = emp.get("department", "")
+    company = emp.get("company", "")
     level = (level or "").strip()
 
     if level == "N":
@@ -422,12 +619,12 @@ def scope_to_persist_for_user(
         depts_under_function = set()
         companies_with_function = set()
         for row in hierarchy_map.values():
-            rfunc = (row.get("function") or "").strip()
+            rfunc = row.get("function", "")
             if rfunc == func:
-                d = (row.get("department") or "").strip()
+                d = row.get("department", "")
                 if d:
                     depts_under_function.add(d)
-                c = (row.get("company") or "").strip()
+                c = row.get("company", "")
                 if c:
                     companies_with_function.add(c)
         return {
@@ -455,10 +652,9 @@ def get_effective_scope(
     - If user has allowed_functions / allowed_departments / allowed_companies set (non-empty), use those.
     - Else derive from employee + data_scope_level: N -> all; N-1 -> own function + all depts under it; N-2 -> only own department.
     """
-    if getattr(user, "role", None) == "admin":
-        return {"all": True, "allowed_functions": None, "allowed_departments": None, "allowed_companies": None}
-    if getattr(user, "role", None) == "N":
-        return {"all": True, "allowed_functions": None, "allowed_departments": None, "allowed_companies": None}
+    match getattr(user, "role", None):
+        case "admin" | "N":
+            return {"all": True, "allowed_functions": None, "allowed_departments": None, "allowed_companies": None}
     af = getattr(user, "allowed_functions", None)
     ad = getattr(user, "allowed_departments", None)
     ac = getattr(user, "allowed_companies", None)
@@ -471,24 +667,25 @@ def get_effective_scope(
     # Default: derive from employee + data_scope_level (N / N-1 / N-2)
     emp_email = (getattr(user, "employee_email", None) or "").strip() or None
     data_scope_level = (getattr(user, "data_scope_level", None) or "").strip() or None
+    # Build the hierarchy once here and pass it through, so no path below rebuilds it
+    if hierarchy_map is None and emp_email:
+        hierarchy_map = build_hierarchy_map(db, None)
     if emp_email and data_scope_level:
         scope = scope_for_user(db, emp_email, data_scope_level, hierarchy_map)
         if scope.get("all"):
             return {"all": True, "allowed_functions": None, "allowed_departments": None, "allowed_companies": None}
         # scope_for_user returns allowed_functions, allowed_departments; add allowed_companies from hierarchy
-        if hierarchy_map is None:
-            hierarchy_map = build_hierarchy_map(db, None)
         emp = hierarchy_map.get(emp_email.lower()) if hierarchy_map else None
         companies = []
         if emp and scope.get("allowed_functions"):
             # For N-1 we have one function; include that function's company
             for row in (hierarchy_map or {}).values():
-                if (row.get("function") or "").strip() in (scope.get("allowed_functions") or []):
-                    c = (row.get("company") or "").strip()
+                if row.get("function", "") in (scope.get("allowed_functions") or []):
+                    c = row.get("company", "")
                     if c and c not in companies:
                         companies.append(c)
-        if emp and not companies and (emp.get("company") or "").strip():
-            companies = [(emp.get("company") or "").strip()]
+        if emp and not companies and emp.get("company", ""):
+            companies = [emp.get("company", "")]
         return {
             "all": False,
             "allowed_functions": scope.get("allowed_functions") or [],
@@ -496,13 +693,11 @@ def get_effective_scope(
             "allowed_companies": companies,
         }
     # No employee/scope: fallback to single-entity scope from hierarchy if we have employee only
-    if hierarchy_map is None:
-        hierarchy_map = build_hierarchy_map(db, None)
-    emp = hierarchy_map.get(emp_email.lower()) if emp_email else None
+    emp = hierarchy_map.get(emp_email.lower()) if emp_email and hierarchy_map else None
     if emp:
-        func = (emp.get("function") or "").strip()
-        dept = (emp.get("department") or "").strip()
-        company = (emp.get("company") or "").strip()
+        func = emp.get("function", "")
+        dept = emp.get("department", "")
+        company = emp.get("company", "")
         return {
             "all": False,
             "allowed_functions": [func] if func else [],
@@ -513,7 +708,9 @@ def get_effective_scope(
 
 
 # Function names to exclude from scope options (e.g. not shown in filters or Cost Settings).
-EXCLUDED_FUNCTIONS = {"CG Board", "CG HR"}
+EXCLUDED_FUNCTIONS = frozenset({"CG Board", "CG HR"})
+# Case-folded form, compared against lowercased function names so "cg hr" is excluded too
+EXCLUDED_FUNCTIONS_L = frozenset(sys.intern(f.lower()) for f in EXCLUDED_FUNCTIONS)
 
 
 def get_scope_options(
@@ -529,20 +726,23 @@ def get_scope_options(
     companies: set = set()
     functions_list: List[Dict[str, str]] = []  # { "name": "IT", "company": "CIPLC" }
     departments_list: List[Dict[str, str]] = []  # { "name": "Dev", "function": "IT", "company": "CIPLC" }
+    # Collapse rows to distinct (company, function, department) triples first, keeping first-seen order
+    triples: Dict[Tuple[str, str, str], None] = {}
+    for row in hierarchy_map.values():
+        triples.setdefault((row.get("company") or "", row.get("function") or "", row.get("department") or ""))
     seen_f = set()
     seen_d = set()
-    for row in hierarchy_map.values():
-        c = (row.get("company") or "").strip()
-        f = (row.get("function") or "").strip()
-        d = (row.get("department") or "").strip()
+    for c, f, d in triples:
         if c:
             companies.add(c)
-        if f and c and f not in EXCLUDED_FUNCTIONS:
+        if f and f.lower() in EXCLUDED_FUNCTIONS_L:
+            continue
+        if f and c:
             key_f = (c, f)
             if key_f not in seen_f:
                 seen_f.add(key_f)
                 functions_list.append({"name": f, "company": c})
-        if d and f and f not in EXCLUDED_FUNCTIONS:
+        if d and f:
             key_d = (f, d)
             if key_d not in seen_d:
                 seen_d.add(key_d)
@@ -583,29 +783,30 @@ def get_scope_options_for_user(
     full_functions = full.get("functions") or []
     full_departments = full.get("departments") or []
 
-    def _dept_in_scope(opt_name: str, allowed: set) -> bool:
-        if not allowed:
+    # Lowercase allowed departments once; each option name is lowered once (not per allowed value)
+    ad_lower = {a.lower() for a in ad}
+
+    def _dept_in_scope(opt_name: str) -> bool:
+        if not ad_lower:
             return True
         on = (opt_name or "").strip().lower()
-        for a in allowed:
-            al = (a or "").strip().lower()
-            if on == al or al in on or on in al:
-                return True
-        return False
+        if on in ad_lower:
+            return True
+        return any(al in on or on in al for al in ad_lower)
 
     companies = [c for c in full_companies if c in ac] if ac else full_companies
+    depts_in_scope = [x for x in full_departments if _dept_in_scope(x.get("name"))] if ad else full_departments
     departments = [
-        x for x in full_departments
-        if (not ad or _dept_in_scope(x.get("name"), ad))
-        and (not af or (x.get("function") or "").strip() in af)
+        x for x in depts_in_scope
+        if (not af or x.get("function", "") in af)
         and (not ac or x.get("company") in ac)
     ]
     if ad and not af:
-        af = {(x.get("function") or "").strip() for x in full_departments if _dept_in_scope(x.get("name"), ad)}
+        af = {x.get("function", "") for x in depts_in_scope}
     af_lower = {a.lower() for a in af} if af else set()
     functions = [
         x for x in full_functions
-        if (not af or (x.get("name") or "").strip().lower() in af_lower) and (not ac or x.get("company") in ac)
+        if (not af or x.get("name", "").lower() in af_lower) and (not ac or x.get("company") in ac)
     ]
     if ac and not companies and full_departments:
         companies = list({x.get("company") for x in departments if x.get("company") in ac})
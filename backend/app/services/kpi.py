@@ -61,7 +61,7 @@ def compute_on_time_stats(db: Session, group_by: str) -> List[Dict[str, Any]]:
     if not group_key:
         raise ValueError("Invalid group_by")
 
-    rows = db.execute(select(UploadedRow.data)).scalars().all()
+    rows = db.execute(select(UploadedRow.data).execution_options(yield_per=1000)).scalars()
 
     # month -> group_value -> accumulators
     members: Dict[Tuple[str, str], set] = defaultdict(set)
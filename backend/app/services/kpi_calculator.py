@@ -1,7 +1,7 @@
 """Service to calculate and store KPIs for uploaded files."""
 from typing import Dict, Any, List, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from collections import defaultdict
 import re
 
@@ -44,12 +44,15 @@ def _extract_month(date_str: str) -> str:
     return s
 
 
+_RE_HH_MM = re.compile(r"(\d{1,2}):(\d{2})")
+
+
 def _time_to_hours(time_str: str) -> float:
     """Convert time string to hours."""
     if not time_str or time_str.strip() == "":
         return 0.0
     s = str(time_str).strip()
-    m = re.match(r"(\d{1,2}):(\d{2})", s)
+    m = _RE_HH_MM.match(s)
     if m:
         return float(m.group(1)) + float(m.group(2)) / 60.0
     return 0.0
@@ -135,13 +138,14 @@ def _calculate_on_time_kpi(db: Session, file_id: int, group_by: str, rows: List[
                 late_count[key] += 1
     
     # Store results
+    mappings = []
     for (month, group_val), member_set in members.items():
         present = present_count.get((month, group_val), 0)
         late = late_count.get((month, group_val), 0)
         on_time = present - late
         on_time_pct = round((on_time / present * 100.0), 2) if present > 0 else 0.0
         
-        kpi = OnTimeKPI(
+        mappings.append(dict(
             file_id=file_id,
             month=month,
             group_by=group_by,
@@ -151,8 +155,10 @@ def _calculate_on_time_kpi(db: Session, file_id: int, group_by: str, rows: List[
             late=late,
             on_time=on_time,
             on_time_pct=on_time_pct
-        )
-        db.add(kpi)
+        ))
+    # One executemany (batched multi-row INSERT) instead of a flushed INSERT per object
+    if mappings:
+        db.execute(insert(OnTimeKPI), mappings)
 
 
 def _calculate_work_hour_kpi(db: Session, file_id: int, group_by: str, rows: List[Dict]):
@@ -222,6 +228,7 @@ def _calculate_work_hour_kpi(db: Session, file_id: int, group_by: str, rows: Lis
                 completed_count[key] += 1
     
     # Store results
+    mappings = []
     for (month, group_val), member_set in members.items():
         present = present_count.get((month, group_val), 0)
         od = od_count.get((month, group_val), 0)
@@ -230,7 +237,7 @@ def _calculate_work_hour_kpi(db: Session, file_id: int, group_by: str, rows: Lis
         completed = completed_count.get((month, group_val), 0)
         completion_pct = round((completed / (present + od) * 100.0), 2) if (present + od) > 0 else 0.0
         
-        kpi = WorkHourKPI(
+        mappings.append(dict(
             file_id=file_id,
             month=month,
             group_by=group_by,
@@ -242,8 +249,9 @@ def _calculate_work_hour_kpi(db: Session, file_id: int, group_by: str, rows: Lis
             work_hours=round(work_hrs, 2),
             completed=completed,
             completion_pct=completion_pct
-        )
-        db.add(kpi)
+        ))
+    if mappings:
+        db.execute(insert(WorkHourKPI), mappings)
 
 
 def _calculate_work_hour_lost_kpi(db: Session, file_id: int, group_by: str, rows: List[Dict]):
@@ -323,6 +331,7 @@ def _calculate_work_hour_lost_kpi(db: Session, file_id: int, group_by: str, rows
             lost_hours_sum[key] += lost_hrs
     
     # Store results
+    mappings = []
     for (month, group_val), member_set in members.items():
         present = present_count.get((month, group_val), 0)
         od = od_count.get((month, group_val), 0)
@@ -331,7 +340,7 @@ def _calculate_work_hour_lost_kpi(db: Session, file_id: int, group_by: str, rows
         lost_hrs = lost_hours_sum.get((month, group_val), 0.0)
         lost_pct = round((lost_hrs / shift_hrs * 100.0), 2) if shift_hrs > 0 else 0.0
         
-        kpi = WorkHourLostKPI(
+        mappings.append(dict(
             file_id=file_id,
             month=month,
             group_by=group_by,
@@ -343,8 +352,9 @@ def _calculate_work_hour_lost_kpi(db: Session, file_id: int, group_by: str, rows
             work_hours=round(work_hrs, 2),
             lost_hours=round(lost_hrs, 2),
             lost_pct=lost_pct
-        )
-        db.add(kpi)
+        ))
+    if mappings:
+        db.execute(insert(WorkHourLostKPI), mappings)
 
 
 def _calculate_leave_analysis_kpi(db: Session, file_id: int, group_by: str, rows: List[Dict]):
@@ -402,8 +412,9 @@ def _calculate_leave_analysis_kpi(db: Session, file_id: int, group_by: str, rows
             count_a[key] += 1
     
     # Store simplified results (adjacency calculation would need full logic)
+    mappings = []
     for (month, group_val), member_set in members.items():
-        kpi = LeaveAnalysisKPI(
+        mappings.append(dict(
             file_id=file_id,
             month=month,
             group_by=group_by,
@@ -420,8 +431,9 @@ def _calculate_leave_analysis_kpi(db: Session, file_id: int, group_by: str, rows
             sl_pct=0.0,
             cl_pct=0.0,
             a_pct=round((count_a.get((month, group_val), 0) / count_workdays.get((month, group_val), 1) * 100.0), 2) if count_workdays.get((month, group_val), 0) > 0 else 0.0
-        )
-        db.add(kpi)
+        ))
+    if mappings:
+        db.execute(insert(LeaveAnalysisKPI), mappings)
 
 
 def run_rebuild_all_kpis(db: Session) -> dict:
@@ -444,6 +456,9 @@ def run_rebuild_all_kpis(db: Session) -> dict:
             calculate_kpis_for_file(db, file.id)
             calculated_count += 1
         except Exception as e:
+            # Each file commits on success, so this discards only the failed file's
+            # partial inserts and leaves the session usable for the next file
+            db.rollback()
             logging.getLogger(__name__).warning(
                 "KPI calculation failed for file id=%s: %s", file.id, e
             )
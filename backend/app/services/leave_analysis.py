@@ -43,25 +43,27 @@ def _extract_month(date_str: str) -> str:
     return s
 
 
+_MONTH_ABBR = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+_RE_DD_MMM_YYYY = re.compile(r"(\d{1,2})[-/](\w{3,})[-/](20\d{2})", re.I)
+_RE_YYYY_MM_DD = re.compile(r"(20\d{2})[-/](\d{1,2})[-/](\d{1,2})")
+
+
 def _parse_date(date_str: str) -> tuple:
     """Parse date string to tuple for comparison."""
     if not date_str:
         return (0, 0, 0)
     s = str(date_str).strip()
     # Try various date formats
-    m = re.search(r"(\d{1,2})[-/](\w{3,})[-/](20\d{2})", s, re.I)
+    m = _RE_DD_MMM_YYYY.search(s)
     if m:
-        month_map = {
-            'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-            'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12,
-            'january': 1, 'february': 2, 'march': 3, 'april': 4, 'june': 6, 'july': 7,
-            'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
-        }
-        month = month_map.get(m.group(2).lower()[:3], 0)
+        month = _MONTH_ABBR.get(m.group(2).lower()[:3], 0)
         day = int(m.group(1))
         year = int(m.group(3))
         return (year, month, day)
-    m = re.search(r"(20\d{2})[-/](\d{1,2})[-/](\d{1,2})", s)
+    m = _RE_YYYY_MM_DD.search(s)
     if m:
         return (int(m.group(1)), int(m.group(2)), int(m.group(3)))
     return (0, 0, 0)
@@ -96,8 +98,8 @@ def compute_leave_analysis(db: Session, group_by: str) -> List[Dict[str, Any]]:
     if not group_key:
         raise ValueError("Invalid group_by")
 
-    # Fetch all rows
-    rows = db.execute(select(UploadedRow.data)).scalars().all()
+    # Stream rows in batches; they are iterated once
+    rows = db.execute(select(UploadedRow.data).execution_options(yield_per=1000)).scalars()
     
     # Organize data by employee for adjacency checking
     emp_data = defaultdict(list)
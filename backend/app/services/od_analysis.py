@@ -45,8 +45,11 @@ def _extract_month(date_str: str) -> str:
 
 def compute_od_analysis(db: Session, group_by: str) -> List[Dict[str, Any]]:
     """Compute OD Analysis KPIs."""
-    # Fetch all rows
-    rows = db.execute(select(UploadedRow.data)).scalars().all()
+    if group_by not in ("function", "employee"):
+        raise ValueError("Invalid group_by")
+    
+    # Stream rows in batches; they are iterated once
+    rows = db.execute(select(UploadedRow.data).execution_options(yield_per=1000)).scalars()
     
     if group_by == "function":
         # Function-wise aggregation (with Company Name - Function Name format)
@@ -156,7 +159,4 @@ def compute_od_analysis(db: Session, group_by: str) -> List[Dict[str, Any]]:
             })
         final_results.sort(key=lambda x: (x["month"], x["function"], x["employee_name"]))
         return final_results
-    
-    else:
-        raise ValueError("Invalid group_by")
 
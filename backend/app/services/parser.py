@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Iterable, Tuple
 import io
 import csv
+from functools import lru_cache
+from datetime import date, datetime, time
 from openpyxl import load_workbook
 
 try:
@@ -10,6 +12,11 @@ try:
 except Exception:  # pragma: no cover
     xlrd = None
 
+try:
+    from python_calamine import CalamineWorkbook  # Rust-backed reader, much faster than openpyxl for values
+except Exception:  # pragma: no cover
+    CalamineWorkbook = None
+
 
 def _stringify(value: Any) -> str:
     if value is None:
@@ -17,42 +24,77 @@ def _stringify(value: Any) -> str:
     return str(value)
 
 
+# Largest magnitude below which every whole float is an exact int; Excel saves huge numbers like 1E+20
+# in exponent form, which openpyxl reads back as float
+_MAX_EXACT_INT_FLOAT = float(2 ** 53)
+
+
+def _calamine_value(value: Any) -> Any:
+    """
+    Match openpyxl's value types: whole numbers as int, date-only cells as datetime. Only floats below
+    2**53 become int; larger ones stay float so they stringify as openpyxl's do (1e+20, not 100000...).
+    """
+    if isinstance(value, float) and value.is_integer() and abs(value) < _MAX_EXACT_INT_FLOAT:
+        return int(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, time())
+    return value
+
+
+def _calamine_rows(wb: Any, sheet_name: str) -> List[List[Any]]:
+    """Cached cell values of one sheet read with calamine, converted to openpyxl-like types."""
+    # skip_empty_area=False keeps leading blank rows/cols so row 0 is the header, as with openpyxl
+    rows = wb.get_sheet_by_name(sheet_name).to_python(skip_empty_area=False)
+    return [[_calamine_value(v) for v in r] for r in rows]
+
+
 def _read_csv(file_bytes: bytes) -> Tuple[List[str], List[Dict[str, Any]]]:
-    text = file_bytes.decode("utf-8-sig", errors="ignore")
-    reader = csv.reader(io.StringIO(text))
+    # Decode incrementally as csv pulls lines instead of materializing the whole file as one str
+    reader = csv.reader(io.TextIOWrapper(io.BytesIO(file_bytes), encoding="utf-8-sig", errors="ignore", newline=""))
     rows_iter = iter(reader)
     try:
         header = next(rows_iter)
     except StopIteration:
         return [], []
     header_order = [str(h) for h in header]
+    ncols = len(header_order)
     rows: List[Dict[str, Any]] = []
     for r in rows_iter:
-        record = {}
-        for idx, col in enumerate(header_order):
-            record[col] = _stringify(r[idx]) if idx < len(r) else ""
-        rows.append(record)
+        # csv already yields str; pad short rows, zip drops extra cells
+        if len(r) < ncols:
+            r.extend([""] * (ncols - len(r)))
+        rows.append(dict(zip(header_order, r)))
     return header_order, rows
 
 
 def _read_xlsx(file_bytes: bytes, data_only: bool = False) -> Tuple[List[str], List[Dict[str, Any]]]:
-    wb = load_workbook(io.BytesIO(file_bytes), data_only=data_only, read_only=True)
-    ws = wb.active
+    # calamine only returns cached values, so formulas-as-text (data_only=False) stays on openpyxl.
+    # It also does not expose the active tab, so it is only used when there is a single sheet;
+    # multi-sheet workbooks read wb.active through openpyxl like before.
+    cwb = None
+    if data_only and CalamineWorkbook is not None:
+        cwb = CalamineWorkbook.from_filelike(io.BytesIO(file_bytes))
+        if len(cwb.sheet_names) > 1:
+            cwb = None
+    if cwb is not None:
+        sheet_rows: Iterable[Any] = _calamine_rows(cwb, cwb.sheet_names[0]) if cwb.sheet_names else []
+    else:
+        wb = load_workbook(io.BytesIO(file_bytes), data_only=data_only, read_only=True)
+        sheet_rows = wb.active.iter_rows(values_only=True)
     first = True
     header_order: List[str] = []
     rows: List[Dict[str, Any]] = []
-    for row_cells in ws.iter_rows(values_only=False):
-        values = [_stringify(c.value) for c in row_cells]
+    for row_values in sheet_rows:
+        values = ["" if v is None else str(v) for v in row_values]
         if first:
             header_order = [str(h) for h in values]
             first = False
             continue
         if not header_order:
             continue
-        record = {}
-        for idx, col in enumerate(header_order):
-            record[col] = values[idx] if idx < len(values) else ""
-        rows.append(record)
+        if len(values) < len(header_order):
+            values.extend([""] * (len(header_order) - len(values)))
+        rows.append(dict(zip(header_order, values)))
     return header_order, rows
 
 
@@ -66,10 +108,7 @@ def _read_xls(file_bytes: bytes) -> Tuple[List[str], List[Dict[str, Any]]]:
     header_order = [str(sheet.cell_value(0, c)) for c in range(sheet.ncols)]
     rows: List[Dict[str, Any]] = []
     for r in range(1, sheet.nrows):
-        record = {}
-        for c in range(sheet.ncols):
-            record[header_order[c]] = _stringify(sheet.cell_value(r, c))
-        rows.append(record)
+        rows.append(dict(zip(header_order, (_stringify(v) for v in sheet.row_values(r)))))
     return header_order, rows
 
 
@@ -86,83 +125,78 @@ def read_file_preserve_text(filename: str, file_bytes: bytes, data_only: bool =
 
 # Standard column names for Teams user list merge
 _TEAMS_USER_LIST_STANDARD = ["Name", "Email", "Designation", "Department", "Function"]
-# Map known header variants (case-insensitive) to standard name by position
-_TEAMS_HEADER_ALIASES = {
-    "name": "Name", "col1": "Name",
-    "email": "Email", "col2": "Email",
-    "designation": "Designation", "col3": "Designation",
-    "department": "Department", "col4": "Department",
-    "function": "Function", "col5": "Function",
+_STANDARD_LOWER = tuple(c.lower() for c in _TEAMS_USER_LIST_STANDARD)
+# Map known header variants (case-insensitive, spaces removed) to the slot of the standard name
+_TEAMS_HEADER_SLOT = {
+    "name": 0, "col1": 0,
+    "email": 1, "col2": 1,
+    "designation": 2, "col3": 2,
+    "department": 3, "col4": 3,
+    "function": 4, "col5": 4,
 }
 
 
+@lru_cache(maxsize=1024)
+def _teams_header_slot(key: str) -> Tuple[int, bool]:
+    """(slot, first_wins) for a raw header, or (-1, False) if the column is not kept. Cached per header name."""
+    key_lower = str(key).strip().lower()
+    if not key_lower:
+        return -1, False
+    slot = _TEAMS_HEADER_SLOT.get(key_lower.replace(" ", ""))
+    if slot is not None:
+        return slot, True
+    # Loose COL1..COL5 variants (e.g. "col\t1") overwrite instead of keeping the first value
+    if key_lower.startswith("col") and len(key_lower) <= 5:
+        idx = key_lower.replace("col", "").strip()
+        if idx in ("1", "2", "3", "4", "5"):
+            return int(idx) - 1, False
+    return -1, False
+
+
 def _normalize_teams_row(raw: Dict[str, Any], sheet_label: str) -> Dict[str, Any]:
     """Convert a row with arbitrary headers to standard keys. Drops serial/other columns."""
-    out = {"Sheet": sheet_label}
-    used = set()
+    values = ["", "", "", "", ""]
+    used = [False, False, False, False, False]
     for key, value in raw.items():
         if key == "Sheet":
             continue
-        key_lower = str(key).strip().lower()
-        if not key_lower:
+        slot, first_wins = _teams_header_slot(key)
+        if slot < 0:
             continue
-        # Match standard names or COL1..COL5 / Name, Email, etc.
-        for alias, standard in _TEAMS_HEADER_ALIASES.items():
-            if key_lower == alias or key_lower.replace(" ", "") == alias:
-                if standard not in used:
-                    out[standard] = _stringify(value)
-                    used.add(standard)
-                break
-        else:
-            if key_lower.startswith("col") and len(key_lower) <= 5:
-                idx = key_lower.replace("col", "").strip()
-                if idx == "1":
-                    out["Name"] = _stringify(value)
-                elif idx == "2":
-                    out["Email"] = _stringify(value)
-                elif idx == "3":
-                    out["Designation"] = _stringify(value)
-                elif idx == "4":
-                    out["Department"] = _stringify(value)
-                elif idx == "5":
-                    out["Function"] = _stringify(value)
-    for col in _TEAMS_USER_LIST_STANDARD:
-        if col not in out:
-            out[col] = ""
+        if first_wins:
+            if used[slot]:
+                continue
+            used[slot] = True
+        values[slot] = _stringify(value)
+    out = {"Sheet": sheet_label}
+    out.update(zip(_TEAMS_USER_LIST_STANDARD, values))
     return out
 
 
 def _is_teams_header_row(normalized: Dict[str, Any]) -> bool:
     """True if this row is the sheet header row (Name, Email, Designation, etc. as values)."""
-    vals = [str(normalized.get(c) or "").strip().lower() for c in _TEAMS_USER_LIST_STANDARD]
-    standard_lower = [c.lower() for c in _TEAMS_USER_LIST_STANDARD]
-    return vals == standard_lower
+    return tuple(str(normalized.get(c) or "").strip().lower() for c in _TEAMS_USER_LIST_STANDARD) == _STANDARD_LOWER
 
 
 # Only count rows that have MICROSOFT TEAMS ESSENTIALS in Assigned Products (if column exists)
 _TEAMS_ESSENTIALS = "microsoft teams essentials"
 
 
-def _row_has_teams_essentials(row_dict: Dict[str, Any]) -> bool:
-    """True if row has an Assigned Products column and it contains MICROSOFT TEAMS ESSENTIALS."""
-    for key, value in row_dict.items():
-        key_lower = str(key).strip().lower()
-        if "assigned" in key_lower and "product" in key_lower:
-            val = _stringify(value).strip().lower()
-            if _TEAMS_ESSENTIALS in val:
-                return True
-            return False
-    return True  # No Assigned Products column: include row (backward compatibility)
+def _assigned_products_key(header_order: List[str]) -> str | None:
+    """First Assigned Products column, if any. Rows are only counted when it contains MICROSOFT TEAMS ESSENTIALS."""
+    for h in header_order:
+        h_lower = h.lower()
+        if "assigned" in h_lower and "product" in h_lower:
+            return h
+    return None  # No Assigned Products column: include row (backward compatibility)
 
 
-def _row_is_licensed_yes(row_dict: Dict[str, Any]) -> bool:
-    """True if row has no 'Is Licensed' column or its value is 'Yes' (case-insensitive)."""
-    for key, value in row_dict.items():
-        key_lower = str(key).strip().lower()
-        if key_lower.replace(" ", "") == "islicensed":
-            val = _stringify(value).strip().lower()
-            return val == "yes"
-    return True  # No Is Licensed column: include row (backward compatibility)
+def _is_licensed_key(header_order: List[str]) -> str | None:
+    """'Is Licensed' column, if any. Rows are only counted when its value is 'Yes' (case-insensitive)."""
+    for h in header_order:
+        if h.lower().replace(" ", "") == "islicensed":
+            return h
+    return None  # No Is Licensed column: include row (backward compatibility)
 
 
 def read_teams_user_list_sheets(file_bytes: bytes) -> Dict[str, Any]:
@@ -175,34 +209,46 @@ def read_teams_user_list_sheets(file_bytes: bytes) -> Dict[str, Any]:
       total_assigned: int
       rows: list of dicts with S.No, Sheet, Name, Email, Designation, Department, Function
     """
-    wb = load_workbook(io.BytesIO(file_bytes), data_only=True, read_only=True)
-    sheet_names_lower = {s.lower(): s for s in wb.sheetnames}
+    wanted = ("teams", "cbl_teams")
+    if CalamineWorkbook is not None:
+        wb = None
+        cwb = CalamineWorkbook.from_filelike(io.BytesIO(file_bytes))
+        sheet_names_lower = {s.lower(): s for s in cwb.sheet_names}
+    else:
+        wb = load_workbook(io.BytesIO(file_bytes), data_only=True, read_only=True)
+        sheet_names_lower = {s.lower(): s for s in wb.sheetnames}
     by_sheet = {}
     all_rows: List[Dict[str, Any]] = []
-    for want in ("teams", "cbl_teams"):
+    for want in wanted:
         sheet_label = "CBL_Teams" if want == "cbl_teams" else "Teams"
         if want not in sheet_names_lower:
             by_sheet[sheet_label] = 0
             continue
         name = sheet_names_lower[want]
-        ws = wb[name]
+        sheet_rows = _calamine_rows(cwb, name) if wb is None else wb[name].iter_rows(values_only=True)
         header_order: List[str] = []
         count = 0
-        for i, row_cells in enumerate(ws.iter_rows(values_only=True)):
+        for i, row_cells in enumerate(sheet_rows):
             values = [c for c in row_cells]
             if i == 0:
                 header_order = [str(h or "").strip() or f"Col{j}" for j, h in enumerate(values)]
+                ap_key = _assigned_products_key(header_order)
+                lic_key = _is_licensed_key(header_order)
                 continue
             if not header_order:
                 continue
             row_dict = {}
             for idx, col in enumerate(header_order):
-                row_dict[col] = _stringify(values[idx]) if idx < len(values) else ""
+                if idx < len(values):
+                    v = values[idx]
+                    row_dict[col] = "" if v is None else str(v)
+                else:
+                    row_dict[col] = ""
             if not any(v for v in row_dict.values() if str(v).strip()):
                 continue
-            if not _row_has_teams_essentials(row_dict):
+            if ap_key is not None and _TEAMS_ESSENTIALS not in row_dict[ap_key].lower():
                 continue
-            if not _row_is_licensed_yes(row_dict):
+            if lic_key is not None and row_dict[lic_key].strip().lower() != "yes":
                 continue
             normalized = _normalize_teams_row(row_dict, sheet_label)
             if _is_teams_header_row(normalized):
@@ -211,7 +257,8 @@ def read_teams_user_list_sheets(file_bytes: bytes) -> Dict[str, Any]:
                 all_rows.append(normalized)
                 count += 1
         by_sheet[sheet_label] = count
-    wb.close()
+    if wb is not None:
+        wb.close()
 
     for idx, row in enumerate(all_rows, start=1):
         row["S.No"] = idx
@@ -1,28 +1,67 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from operator import itemgetter
 import re
+import sys
 from datetime import datetime, timedelta
 
 from ..models import UploadedRow
 
 
-def _get_company_short_name(company_name: str) -> str:
-    """Convert company name to short code."""
-    company_map = {
-        "Confidence Batteries Limited": "CBL",
-        "Confidence Infrastructure PLC.": "CIPLC",
-        "Confidence Steel Export Limited": "CSEL",
-    }
-    return company_map.get(company_name, company_name)
+_COMPANY_SHORT_NAMES = {
+    "Confidence Batteries Limited": "CBL",
+    "Confidence Infrastructure PLC.": "CIPLC",
+    "Confidence Steel Export Limited": "CSEL",
+}
+# Company codes that may trail a function name, e.g. "CIPLC Factory - CIPLC"
+_COMPANY_ABBREVS = ("CBL", "CIPLC", "CSEL")
 
 
+def _get_company_short_name(company_name: str) -> str:
+    """Convert company name to short code."""
+    return _COMPANY_SHORT_NAMES.get(company_name, company_name)
+
+
+# Month names are matched by their first three letters (covers Sept, January, ...)
+_MONTH_ABBR = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+_RE_DD_MMM_YYYY = re.compile(r"(\d{1,2})[-/](\w{3,})[-/](20\d{2}|\d{2})", re.I)
+_RE_YYYY_MM_DD = re.compile(r"(20\d{2})[-/](\d{1,2})[-/](\d{1,2})")
+_RE_DD_MM_YYYY = re.compile(r"(\d{1,2})[-/](\d{1,2})[-/](20\d{2})")
+_RE_DD_MM_YYYY_SLASH = re.compile(r"(\d{1,2})/(\d{1,2})/(20\d{2})")
+
+# strptime fallbacks grouped by separator, original priority kept within each group.
+# Each format carries the (min, max) length of strings it can match, so formats that
+# cannot fit are skipped without raising (%b/%B: C-locale month names, 3-9 letters).
+_STRPTIME_FORMATS = (
+    ("-", (
+        ("%Y-%m-%d", 8, 10), ("%d-%m-%Y", 8, 10),
+        ("%d-%m-%y", 6, 8),  # 2-digit year
+        ("%d-%b-%Y", 10, 11), ("%d-%B-%Y", 10, 17),  # 15-Jan-2025, 15-January-2025
+    )),
+    ("/", (
+        ("%d/%m/%Y", 8, 10), ("%Y/%m/%d", 8, 10),
+        ("%m/%d/%Y", 8, 10),  # US format
+        ("%d/%m/%y", 6, 8),
+        ("%d/%b/%Y", 10, 11), ("%d/%B/%Y", 10, 17),
+    )),
+    (".", (("%d.%m.%Y", 8, 10), ("%Y.%m.%d", 8, 10))),
+)
+
+
+@lru_cache(maxsize=65536)
 def _parse_date(date_str: str) -> datetime | None:
     """
     Parse date string to datetime object. Handles multiple formats including Excel dates.
     Matches the logic used in _extract_month but returns full date.
+    Cached: attendance files repeat the same few dates across every employee.
     """
     if not date_str:
         return None
@@ -44,14 +83,37 @@ def _parse_date(date_str: str) -> datetime | None:
     except (ValueError, TypeError):
         pass
     
+    # ISO date prefix (YYYY-MM-DD, optionally followed by a time): one C-level parse instead of the cascade.
+    # Anything that fromisoformat rejects falls through to the generic handling below.
+    if (
+        len(s) >= 10 and s[4] == '-' and s[7] == '-' and s.startswith('20')
+        and (len(s) == 10 or s[10] in ' T') and '-' not in s[10:] and '/' not in s
+    ):
+        try:
+            return datetime.fromisoformat(s[:10])
+        except ValueError:
+            pass
+
+    # Dominant attendance export shape DD-Mon-YYYY (e.g. 05-Nov-2025): slice it directly before the cascade
+    parts = s.split('-')
+    if (
+        len(parts) == 3 and len(parts[0]) <= 2 and parts[0].isascii() and parts[0].isdigit()
+        and len(parts[1]) >= 3 and parts[1].isalpha()
+        and len(parts[2]) == 4 and parts[2].startswith('20') and parts[2].isascii() and parts[2].isdigit()
+    ):
+        month_num = _MONTH_ABBR.get(parts[1][:3].lower())
+        day = int(parts[0])
+        if month_num and 1 <= day <= 31:
+            try:
+                return datetime(int(parts[2]), month_num, day)
+            except ValueError:
+                pass
+
+    # All regex shapes below need a - or / separator; skip straight to strptime otherwise
+    has_sep = '-' in s or '/' in s
+
     # Try DD-MMM-YYYY or DD-MMM-YY format (e.g., 15-Jan-2025, 15-Jan-25)
-    month_map = {
-        'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-        'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12,
-        'january': 1, 'february': 2, 'march': 3, 'april': 4, 'june': 6, 'july': 7,
-        'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
-    }
-    m = re.search(r"(\d{1,2})[-/](\w{3,})[-/](20\d{2}|\d{2})", s, re.I)
+    m = _RE_DD_MMM_YYYY.search(s) if has_sep else None
     if m:
         try:
             day = int(m.group(1))
@@ -62,16 +124,14 @@ def _parse_date(date_str: str) -> datetime | None:
                 year = 2000 + year if year < 100 else 1900 + year
             
             # Try to match month name
-            for key, month_num in month_map.items():
-                if month_name.startswith(key):
-                    if 1 <= day <= 31:
-                        return datetime(year, month_num, day)
-                    break
+            month_num = _MONTH_ABBR.get(month_name[:3])
+            if month_num and 1 <= day <= 31:
+                return datetime(year, month_num, day)
         except (ValueError, TypeError):
             pass
     
     # Try YYYY-MM-DD format (e.g., 2025-01-15, 2025-1-5)
-    m = re.search(r"(20\d{2})[-/](\d{1,2})[-/](\d{1,2})", s)
+    m = _RE_YYYY_MM_DD.search(s) if has_sep else None
     if m:
         try:
             year = int(m.group(1))
@@ -83,7 +143,7 @@ def _parse_date(date_str: str) -> datetime | None:
             pass
     
     # Try DD-MM-YYYY format (e.g., 15-01-2025, 5-1-2025)
-    m = re.search(r"(\d{1,2})[-/](\d{1,2})[-/](20\d{2})", s)
+    m = _RE_DD_MM_YYYY.search(s) if has_sep else None
     if m:
         try:
             day = int(m.group(1))
@@ -95,7 +155,7 @@ def _parse_date(date_str: str) -> datetime | None:
             pass
     
     # Try DD/MM/YYYY format (e.g., 15/01/2025)
-    m = re.search(r"(\d{1,2})/(\d{1,2})/(20\d{2})", s)
+    m = _RE_DD_MM_YYYY_SLASH.search(s) if has_sep else None
     if m:
         try:
             day = int(m.group(1))
@@ -106,31 +166,25 @@ def _parse_date(date_str: str) -> datetime | None:
         except (ValueError, TypeError):
             pass
     
-    # Try parsing with datetime.strptime for common formats
-    common_formats = [
-        "%Y-%m-%d",
-        "%d-%m-%Y",
-        "%d/%m/%Y",
-        "%Y/%m/%d",
-        "%d.%m.%Y",
-        "%Y.%m.%d",
-        "%m/%d/%Y",  # US format
-        "%d-%m-%y",  # 2-digit year
-        "%d/%m/%y",
-        "%d-%b-%Y",  # 15-Jan-2025
-        "%d-%B-%Y",  # 15-January-2025
-        "%d/%b/%Y",
-        "%d/%B/%Y",
-    ]
-    for fmt in common_formats:
-        try:
-            parsed = datetime.strptime(s, fmt)
-            # If 2-digit year, assume 2000s
-            if fmt.endswith("%y") and parsed.year < 2000:
-                parsed = parsed.replace(year=parsed.year + 2000)
-            return parsed
-        except (ValueError, TypeError):
+    # Try parsing with datetime.strptime for common formats. A format only matches strings that
+    # contain its separator, fit its length range, and start and end with a digit.
+    if not (s[0].isdigit() and s[-1].isdigit()):
+        return None
+    n = len(s)
+    for sep, formats in _STRPTIME_FORMATS:
+        if sep not in s:
             continue
+        for fmt, min_len, max_len in formats:
+            if not min_len <= n <= max_len:
+                continue
+            try:
+                parsed = datetime.strptime(s, fmt)
+                # If 2-digit year, assume 2000s
+                if fmt.endswith("%y") and parsed.year < 2000:
+                    parsed = parsed.replace(year=parsed.year + 2000)
+                return parsed
+            except (ValueError, TypeError):
+                continue
     
     return None
 
@@ -154,11 +208,21 @@ def _format_week_key(year: int, month: int, week: int) -> str:
     return f"{year}-{month:02d}-W{week:02d}"
 
 
+@lru_cache(maxsize=8192)
 def _time_to_hours(time_str: str) -> float:
     """Convert time string to hours. Handles HH:MM, HH.MM, and Excel serial (0-1 = fraction of day)."""
     if not time_str:
         return 0.0
     s = str(time_str).strip()
+    # Fast path for the usual clock shapes (HH:MM, H:MM, HH:MM:SS): no float() attempt, no exceptions
+    if s.isascii():
+        n = len(s)
+        if n == 5 and s[2] == ':' and s[:2].isdigit() and s[3:].isdigit():
+            return int(s[:2]) + int(s[3:]) / 60.0
+        if n == 4 and s[1] == ':' and s[0].isdigit() and s[2:].isdigit():
+            return int(s[0]) + int(s[2:]) / 60.0
+        if n == 8 and s[2] == ':' and s[5] == ':' and s[:2].isdigit() and s[3:5].isdigit() and s[6:].isdigit():
+            return int(s[:2]) + int(s[3:5]) / 60.0 + int(s[6:]) / 3600.0
     # Excel serial: time stored as fraction of day (e.g. 0.395833 = 09:30)
     try:
         v = float(s.replace(",", "."))
@@ -166,7 +230,7 @@ def _time_to_hours(time_str: str) -> float:
             return v * 24.0
     except (ValueError, TypeError):
         pass
-    parts = re.split(r'[:.]', s)
+    parts = s.replace('.', ':').split(':')
     if len(parts) >= 2:
         try:
             h = int(parts[0])
@@ -178,8 +242,9 @@ def _time_to_hours(time_str: str) -> float:
     return 0.0
 
 
+@lru_cache(maxsize=8192)
 def _compute_duration_hours(start_str: str, end_str: str) -> float:
-    """Compute duration in hours, handling overnight shifts."""
+    """Compute duration in hours, handling overnight shifts. Cached: shift/punch pairs repeat heavily."""
     start_h = _time_to_hours(start_str)
     end_h = _time_to_hours(end_str)
     if start_h == 0.0 or end_h == 0.0:
@@ -190,6 +255,99 @@ def _compute_duration_hours(start_str: str, end_str: str) -> float:
     return max(0, end_h - start_h)
 
 
+# Attendance flags as small ints; P and OD come first so "counts toward work hours" is flag_code <= _FLAG_OD
+_FLAG_P, _FLAG_OD, _FLAG_SL, _FLAG_CL, _FLAG_A, _FLAG_OTHER = range(6)
+_FLAG_CODES = {"P": _FLAG_P, "OD": _FLAG_OD, "SL": _FLAG_SL, "CL": _FLAG_CL, "A": _FLAG_A}
+
+# Fallback chains, in priority order
+_DATE_FALLBACK_COLUMNS = ("Attendance Date", "attendance date", "Date", "date", "AttendanceDate", "ATTENDANCE DATE")
+_DEPARTMENT_COLUMNS = ("Department Name", "Department")
+_COMPANY_COLUMNS = ("Company Name", "Comapny Name")
+_FUNCTION_COLUMNS = (
+    "Function", "Function Name", "Section Info", "Function Name (Level 1)", "Division", "Business Function",
+)
+_MONTH_NAMES = ('', 'January', 'February', 'March', 'April', 'May', 'June',
+                'July', 'August', 'September', 'October', 'November', 'December')
+_DATE_COLUMNS = frozenset({"attendance date", "date", "attendance_date", "attdate"})
+
+
+@lru_cache(maxsize=8192)
+def _function_group_value(company_name: str, function_name: str) -> str:
+    """
+    Function-wise group label "<company short> - <function>". Computed once per distinct
+    (company, function) pair; attendance rows repeat a small set of them.
+    """
+    # Normalize: remove company suffix e.g. "CIPLC Factory - CIPLC" -> "CIPLC Factory" so it matches Employee List / Cost Settings
+    base_function = function_name
+    if " - " in function_name:
+        parts = function_name.split(" - ")
+        last_part = parts[-1].strip().upper()
+        if any(abbrev in last_part for abbrev in _COMPANY_ABBREVS):
+            base_function = " - ".join(parts[:-1]).strip()
+    company_short = _get_company_short_name(company_name)
+    if company_short and base_function:
+        return f"{company_short} - {base_function}"
+    elif base_function:
+        return base_function
+    return company_short or "Unknown"
+
+
+@lru_cache(maxsize=256)
+def _resolve_columns(header: tuple, group_candidates: tuple) -> tuple:
+    """
+    Resolve the columns to read for one header layout: the first column whose name matches a date
+    alias case-insensitively, the first group candidate present, and for each fallback chain the
+    chain columns that exist. Uploads share a handful of layouts, so this runs once per layout
+    rather than once per row.
+    """
+    present = set(header)
+    date_key = next((k for k in header if k.lower().strip() in _DATE_COLUMNS), None)
+    group_col = next((k for k in group_candidates if k in present), None)
+    return (
+        date_key,
+        group_col,
+        tuple(k for k in _DATE_FALLBACK_COLUMNS if k in present),
+        tuple(k for k in _DEPARTMENT_COLUMNS if k in present),
+        tuple(k for k in _COMPANY_COLUMNS if k in present),
+        tuple(k for k in _FUNCTION_COLUMNS if k in present),
+    )
+
+
+def _first_value(data: Dict[str, Any], keys: tuple, last_key: Optional[str]) -> Any:
+    """
+    Same result as data.get(k1, "") or data.get(k2, "") or ... or data.get(last_key, ""), given the
+    chain's columns that are present in data (absent ones would only contribute "").
+    """
+    for k in keys:
+        v = data[k]
+        if v:
+            return v
+    return data.get(last_key, "")
+
+
+@dataclass(slots=True)
+class _WeeklyBucket:
+    """All aggregates for one (week, group) or (week, group, department) key, updated with a single lookup per row."""
+
+    members: Set[str] = field(default_factory=set)
+    departments: Set[str] = field(default_factory=set)  # department names (when not using dept breakdown)
+    present: int = 0
+    late: int = 0
+    on_time: int = 0
+    # Work hour data
+    shift_hours: float = 0.0
+    work_hours: float = 0.0
+    completed: int = 0  # count of completed work hours
+    total_work_days: int = 0
+    # Work hour lost
+    lost_hours: float = 0.0
+    # Leave analysis data
+    sl: int = 0  # SL (Sick Leave) count
+    cl: int = 0  # CL (Casual Leave) count
+    a: int = 0  # A (Absent) count
+    total_leave_days: int = 0
+
+
 def compute_weekly_analysis(
     db: Session, group_by: str, breakdown: Optional[str] = None
 ):
@@ -219,31 +377,19 @@ def compute_weekly_analysis(
 
     use_dept_breakdown = group_by == "function" and breakdown == "department"
 
-    # Fetch all rows
-    rows = db.query(UploadedRow).all()
-
-    # Aggregation structures; key is (week, group) or (week, group, department) when use_dept_breakdown
-    members = defaultdict(set)
-    present_count = defaultdict(int)  # (week, group) -> count
-    late_count = defaultdict(int)  # (week, group) -> count
-    on_time_count = defaultdict(int)  # (week, group) -> count
-    group_departments = defaultdict(set)  # (week, group) -> set of department names
-    
-    # Work hour data
-    shift_hours_sum = defaultdict(float)  # (week, group) -> total shift hours
-    work_hours_sum = defaultdict(float)  # (week, group) -> total work hours
-    completed_count = defaultdict(int)  # (week, group) -> count of completed work hours
-    total_work_days = defaultdict(int)  # (week, group) -> total work days
-    
-    # Work hour lost
-    lost_hours_sum = defaultdict(float)  # (week, group) -> total lost hours
-    
-    # Leave analysis data
-    leave_members = defaultdict(set)  # (week, group) -> set of member IDs for leave tracking
-    sl_count = defaultdict(int)  # (week, group) -> SL (Sick Leave) count
-    cl_count = defaultdict(int)  # (week, group) -> CL (Casual Leave) count
-    a_count = defaultdict(int)  # (week, group) -> A (Absent) count
-    total_leave_days = defaultdict(int)  # (week, group) -> total leave days
+    # Stream only the JSON payload column in batches instead of materializing every ORM row.
+    # Rows that are not JSON objects can never contribute, so MySQL drops them before they cross the wire.
+    rows = (
+        db.query(UploadedRow.data)
+        .filter(func.json_type(UploadedRow.data) == "OBJECT")
+        .yield_per(1000)
+    )
+
+    # One accumulator per key; key is (week, group) or (week, group, department) when use_dept_breakdown
+    buckets: Dict[tuple, _WeeklyBucket] = {}
+    group_candidates = (group_key, *fallback_map.get(group_by, []))
+    # Raw date string -> week key (None when the date does not parse)
+    week_keys: Dict[str, Optional[int]] = {}
     
     for row in rows:
         if not isinstance(row.data, dict):
@@ -251,72 +397,44 @@ def compute_weekly_analysis(
         
         data = row.data
         
-        # Parse date - try multiple possible column names (case-insensitive search)
-        date_str = None
-        for key in data.keys():
-            key_lower = key.lower().strip()
-            if key_lower in ["attendance date", "date", "attendance_date", "attdate"]:
-                date_str = str(data.get(key, "")).strip()
-                break
+        # Parse date - try multiple possible column names (case-insensitive search, resolved once per header layout)
+        date_key, group_col, date_cols, dept_cols, company_cols, function_cols = _resolve_columns(
+            tuple(data), group_candidates
+        )
+        date_str = str(data.get(date_key, "")).strip() if date_key is not None else None
         
         if not date_str:
             # Try exact match as fallback
-            date_str = (
-                data.get("Attendance Date", "") or 
-                data.get("attendance date", "") or 
-                data.get("Date", "") or
-                data.get("date", "") or
-                data.get("AttendanceDate", "") or
-                data.get("ATTENDANCE DATE", "")
-            )
+            date_str = _first_value(data, date_cols, "ATTENDANCE DATE")
             date_str = str(date_str).strip() if date_str else ""
         
-        date = _parse_date(date_str)
-        if not date:
+        # Each distinct date string is parsed and formatted once per call
+        if date_str in week_keys:
+            week_key = week_keys[date_str]
+        else:
+            date = _parse_date(date_str)
+            if date:
+                year, month, week_in_month = _get_week_key(date)
+                # Packed YYYYMMWW int; the YYYY-MM-WNN label is only formatted per result row
+                week_key = year * 10000 + month * 100 + week_in_month
+            else:
+                week_key = None
+            week_keys[date_str] = week_key
+        if week_key is None:
             # Skip rows without valid dates
             continue
         
-        week_tuple = _get_week_key(date)
-        week_key = _format_week_key(week_tuple[0], week_tuple[1], week_tuple[2])
-        
         # Get group value and department
-        department_name = str(data.get("Department Name", "") or data.get("Department", "")).strip()
+        department_name = str(_first_value(data, dept_cols, "Department")).strip()
         
         # For function-wise, combine Company - Function. Prefer "Function" then fallbacks so attendance files with "Function Name" etc. still show function in charts and match Cost Settings.
         if group_by == "function":
-            company_name = str(data.get("Company Name", "") or data.get("Comapny Name", "")).strip()
-            function_name = str(
-                data.get("Function", "")
-                or data.get("Function Name", "")
-                or data.get("Section Info", "")
-                or data.get("Function Name (Level 1)", "")
-                or data.get("Division", "")
-                or data.get("Business Function", "")
-                or ""
-            ).strip()
-            # Normalize: remove company suffix e.g. "CIPLC Factory - CIPLC" -> "CIPLC Factory" so it matches Employee List / Cost Settings
-            base_function = function_name
-            if " - " in function_name:
-                parts = function_name.split(" - ")
-                if len(parts) >= 2:
-                    last_part = parts[-1].strip().upper()
-                    company_abbrevs = ["CBL", "CIPLC", "CSEL"]
-                    if any(abbrev in last_part for abbrev in company_abbrevs):
-                        base_function = " - ".join(parts[:-1]).strip()
-            company_short = _get_company_short_name(company_name)
-            if company_short and base_function:
-                group_val = f"{company_short} - {base_function}"
-            elif base_function:
-                group_val = base_function
-            else:
-                group_val = company_short or "Unknown"
+            company_name = str(_first_value(data, company_cols, "Comapny Name")).strip()
+            function_name = str(_first_value(data, function_cols, None) or "").strip()
+            group_val = _function_group_value(company_name, function_name)
         else:
             # For company/location, get the group value
-            group_val = ""
-            for key in [group_key] + fallback_map.get(group_by, []):
-                if key in data:
-                    group_val = str(data.get(key, "")).strip()
-                    break
+            group_val = str(data.get(group_col, "")).strip() if group_col is not None else ""
             
             if not group_val:
                 continue
@@ -325,45 +443,47 @@ def compute_weekly_analysis(
             if group_by == "company":
                 group_val = _get_company_short_name(group_val)
         
-        # Get employee ID
-        emp_code = str(data.get("Employee Code", "")).strip()
-        emp_name = str(data.get("Name", "")).strip()
-        member_id = emp_code or emp_name
+        # Get employee ID (Name only needed when the code is missing)
+        member_id = str(data.get("Employee Code", "")).strip() or str(data.get("Name", "")).strip()
         
         if not member_id:
             continue
 
+        # Interned so the many rows of one bucket share a single string (cached hash, identity compare)
+        group_val = sys.intern(group_val)
+        department_name = sys.intern(department_name)
         if use_dept_breakdown:
             dept_key = department_name or "__no_dept__"
             key = (week_key, group_val, dept_key)
         else:
             key = (week_key, group_val)
 
-        # Track unique members
-        members[key].add(member_id)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _WeeklyBucket()
+
+        # Track unique members. One employee lands in every week's bucket and in the company-month
+        # union; interning makes all those set entries point at one string instead of a copy per row.
+        bucket.members.add(sys.intern(member_id))
 
         # Track department for this group (when not using dept breakdown)
         if not use_dept_breakdown and department_name:
-            group_departments[key].add(department_name)
+            bucket.departments.add(department_name)
         
         # On-time analysis
-        flag = str(data.get("Flag", "")).strip()
-        is_late = str(data.get("Is Late", "")).strip().lower() == "yes"
+        flag_code = _FLAG_CODES.get(str(data.get("Flag", "")).strip(), _FLAG_OTHER)
         
-        if flag == "P":
-            present_count[key] += 1
-            if is_late:
-                late_count[key] += 1
+        if flag_code == _FLAG_P:
+            bucket.present += 1
+            if str(data.get("Is Late", "")).strip().lower() == "yes":
+                bucket.late += 1
             else:
-                on_time_count[key] += 1
+                bucket.on_time += 1
         
         # Work hour analysis
-        # Skip weekends and holidays (Flag="W" or "H")
+        # Weekends and holidays (Flag="W" or "H") and every other flag skip work hour calculations.
         # Only count P (Present) and OD (On Duty) for work hour lost calculation.
-        if flag == "W" or flag == "H":
-            # Still track for leave analysis, but skip work hour calculations
-            pass
-        elif flag == "P" or flag == "OD":
+        if flag_code <= _FLAG_OD:
             shift_in = str(data.get("Shift In Time", "")).strip()
             shift_out = str(data.get("Shift Out Time", "")).strip()
             in_time = str(data.get("In Time", "")).strip()
@@ -373,105 +493,99 @@ def compute_weekly_analysis(
             work_hours = _compute_duration_hours(in_time, out_time)
             
             if shift_hours > 0 or work_hours > 0:
-                shift_hours_sum[key] += shift_hours
-                work_hours_sum[key] += work_hours
-                total_work_days[key] += 1
+                bucket.shift_hours += shift_hours
+                bucket.work_hours += work_hours
+                bucket.total_work_days += 1
                 
                 # Check if work hours completed (work hours >= shift hours for P or OD)
                 if work_hours >= shift_hours and shift_hours > 0:
-                    completed_count[key] += 1
+                    bucket.completed += 1
                 
                 # Lost hours = shift hours minus actual work hours (per row, then summed per week+group).
                 # Only P and OD count for work hour lost.
                 if shift_hours > 0 and work_hours < shift_hours:
-                    lost_hours = shift_hours - work_hours
-                    lost_hours_sum[key] += lost_hours
-        
-        # Leave analysis
-        if member_id:
-            leave_members[key].add(member_id)
-        
-        if flag == "SL":
-            sl_count[key] += 1
-            total_leave_days[key] += 1
-        elif flag == "CL":
-            cl_count[key] += 1
-            total_leave_days[key] += 1
-        elif flag == "A":
-            a_count[key] += 1
-            total_leave_days[key] += 1
+                    bucket.lost_hours += shift_hours - work_hours
+        # Leave analysis (leave members are the same set as members: member_id is always set here)
+        elif flag_code == _FLAG_SL:
+            bucket.sl += 1
+            bucket.total_leave_days += 1
+        elif flag_code == _FLAG_CL:
+            bucket.cl += 1
+            bucket.total_leave_days += 1
+        elif flag_code == _FLAG_A:
+            bucket.a += 1
+            bucket.total_leave_days += 1
     
     # Build results and optionally company-level aggregates per month (for N-1 full company view)
     results = []
-    all_keys = set(members.keys())
-    all_keys.update(shift_hours_sum.keys())
     company_month_agg = {}  # (month_key, company) -> { members: set, shift_hours, work_hours, lost }
+    week_infos: Dict[int, tuple] = {}  # week key -> (year, month, week, week label, month name, month key)
 
-    for key in all_keys:
+    for key, bucket in buckets.items():
         if use_dept_breakdown and len(key) == 3:
-            week_key_str, group_val, dept_val = key
+            week_key, group_val, dept_val = key
             department = "" if dept_val == "__no_dept__" else dept_val
         else:
-            week_key_str = key[0]
+            week_key = key[0]
             group_val = key[1]
-            departments = sorted(list(group_departments.get(key, set())))
-            department = ", ".join(departments) if departments else ""
-
-        # Parse week key: YYYY-MM-WW
-        week_parts = week_key_str.split('-')
-        if len(week_parts) >= 3:
-            year = int(week_parts[0])
-            month = int(week_parts[1])
-            week = int(week_parts[2].replace('W', ''))
-        else:
-            year = int(week_parts[0]) if len(week_parts) > 0 else 2025
-            month = 1
-            week = int(week_parts[1].replace('W', '')) if len(week_parts) > 1 else 1
+            department = ", ".join(sorted(bucket.departments))
+
+        # Unpack week key (YYYYMMWW) and its labels once per distinct week, not once per result row
+        week_info = week_infos.get(week_key)
+        if week_info is None:
+            year, rem = divmod(week_key, 10000)
+            month, week = divmod(rem, 100)
+            week_info = week_infos[week_key] = (
+                year,
+                month,
+                week,
+                _format_week_key(year, month, week),
+                _MONTH_NAMES[month] if 1 <= month <= 12 else f"Month{month}",
+                f"{year}-{month:02d}",
+            )
+        year, month, week, week_key_str, month_name, month_key = week_info
 
         # On-time metrics
-        present = present_count.get(key, 0)
-        late = late_count.get(key, 0)
-        on_time = on_time_count.get(key, 0)
+        present = bucket.present
+        late = bucket.late
+        on_time = bucket.on_time
         on_time_pct = round((on_time / present * 100.0), 2) if present > 0 else 0.0
 
         # Work hour completion metrics
-        shift_hours = shift_hours_sum.get(key, 0.0)
-        work_hours = work_hours_sum.get(key, 0.0)
-        completed = completed_count.get(key, 0)
-        total_days = total_work_days.get(key, 0)
+        shift_hours = bucket.shift_hours
+        work_hours = bucket.work_hours
+        completed = bucket.completed
+        total_days = bucket.total_work_days
         completion_pct = round((completed / total_days * 100.0), 2) if total_days > 0 else 0.0
 
         # Work hour lost metrics
-        lost_hours = lost_hours_sum.get(key, 0.0)
+        lost_hours = bucket.lost_hours
         lost_pct = round((lost_hours / shift_hours * 100.0), 2) if shift_hours > 0 else 0.0
 
         # Company-level aggregation per month (for N-1 full company summary)
         if use_dept_breakdown and group_val:
-            month_key = f"{year}-{month:02d}"
             company = (group_val.split(" - ")[0].strip() if " - " in group_val else group_val) or "Unknown"
             ckey = (month_key, company)
             if ckey not in company_month_agg:
                 company_month_agg[ckey] = {"members": set(), "shift_hours": 0.0, "work_hours": 0.0, "lost": 0.0}
-            company_month_agg[ckey]["members"].update(members.get(key, set()))
+            company_month_agg[ckey]["members"].update(bucket.members)
             company_month_agg[ckey]["shift_hours"] += shift_hours
             company_month_agg[ckey]["work_hours"] += work_hours
             company_month_agg[ckey]["lost"] += lost_hours
 
-        # Leave analysis metrics
-        leave_members_count = len(leave_members.get(key, set()))
-        sl = sl_count.get(key, 0)
-        cl = cl_count.get(key, 0)
-        a = a_count.get(key, 0)
-        total_leave = total_leave_days.get(key, 0)
-        total_leave_members = leave_members_count
-
-        sl_pct = round((sl / total_leave * 100.0), 2) if total_leave > 0 else 0.0
-        cl_pct = round((cl / total_leave * 100.0), 2) if total_leave > 0 else 0.0
-        a_pct = round((a / total_leave * 100.0), 2) if total_leave > 0 else 0.0
-
-        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June',
-                      'July', 'August', 'September', 'October', 'November', 'December']
-        month_name = month_names[month] if 1 <= month <= 12 else f"Month{month}"
+        # Leave analysis metrics (leave members are the bucket's members)
+        members_count = len(bucket.members)
+        sl = bucket.sl
+        cl = bucket.cl
+        a = bucket.a
+        total_leave = bucket.total_leave_days
+        if total_leave > 0:
+            sl_pct = round((sl / total_leave * 100.0), 2)
+            cl_pct = round((cl / total_leave * 100.0), 2)
+            a_pct = round((a / total_leave * 100.0), 2)
+        else:
+            sl_pct = cl_pct = a_pct = 0.0
+        lost_rounded = round(lost_hours, 2)
 
         results.append({
             "week": week_key_str,  # Keep original format for sorting/filtering
@@ -481,7 +595,7 @@ def compute_weekly_analysis(
             "week_in_month": week,
             "group": group_val,
             "department": department,
-            "members": len(members.get(key, set())),
+            "members": members_count,
             "present": present,
             "late": late,
             "on_time": on_time,
@@ -491,11 +605,11 @@ def compute_weekly_analysis(
             "completed": completed,
             "total_days": total_days,
             "completion_pct": completion_pct,
-            "lost_hours": round(lost_hours, 2),
+            "lost_hours": lost_rounded,
             "lost_pct": lost_pct,
-            "lost": round(lost_hours, 2),  # Alias for lost_hours for chart compatibility
+            "lost": lost_rounded,  # Alias for lost_hours for chart compatibility
             # Leave analysis fields
-            "leave_members": leave_members_count,
+            "leave_members": members_count,
             "sl": sl,
             "cl": cl,
             "a": a,
@@ -505,7 +619,7 @@ def compute_weekly_analysis(
         })
     
     # Sort by year, month, week, group, and department (when breakdown)
-    results.sort(key=lambda x: (x["year"], x["month"], x["week_in_month"], x["group"], x.get("department", "")))
+    results.sort(key=itemgetter("year", "month", "week_in_month", "group", "department"))
 
     if not use_dept_breakdown:
         company_month_agg = None
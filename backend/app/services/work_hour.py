@@ -42,6 +42,9 @@ def _extract_month(date_str: str) -> str:
     return s
 
 
+_RE_TIME_SPLIT = re.compile(r'[:.]')
+
+
 def _time_to_hours(time_str: str) -> float:
     """Convert time string to hours. Handles HH:MM, HH.MM, and Excel serial (0-1 = fraction of day)."""
     if not time_str:
@@ -53,7 +56,7 @@ def _time_to_hours(time_str: str) -> float:
             return v * 24.0
     except (ValueError, TypeError):
         pass
-    parts = re.split(r'[:.]', s)
+    parts = _RE_TIME_SPLIT.split(s)
     if len(parts) >= 2:
         try:
             h = int(parts[0])
@@ -93,7 +96,7 @@ def compute_work_hour_completion(db: Session, group_by: str) -> List[Dict[str, A
     if not group_key:
         raise ValueError("Invalid group_by")
 
-    rows = db.execute(select(UploadedRow.data)).scalars().all()
+    rows = db.execute(select(UploadedRow.data).execution_options(yield_per=1000)).scalars()
 
     members = defaultdict(set)
     present_count = defaultdict(int)
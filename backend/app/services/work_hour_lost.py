@@ -43,6 +43,9 @@ def _extract_month(date_str: str) -> str:
     return s
 
 
+_RE_TIME_SPLIT = re.compile(r'[:.]')
+
+
 def _time_to_hours(time_str: str) -> float:
     """Convert time string to hours. Handles datetime, HH:MM, and Excel serial (0-1 = fraction of day)."""
     if not time_str:
@@ -66,7 +69,7 @@ def _time_to_hours(time_str: str) -> float:
         return dt.hour + dt.minute / 60.0 + dt.second / 3600.0
     except (ValueError, TypeError):
         pass
-    parts = re.split(r'[:.]', s)
+    parts = _RE_TIME_SPLIT.split(s)
     if len(parts) >= 2:
         try:
             h = int(parts[0])
@@ -108,7 +111,7 @@ def compute_work_hour_lost(db: Session, group_by: str) -> List[Dict[str, Any]]:
     if not group_key:
         raise ValueError("Invalid group_by")
 
-    rows = db.execute(select(UploadedRow.data)).scalars().all()
+    rows = db.execute(select(UploadedRow.data).execution_options(yield_per=1000)).scalars()
 
     members = defaultdict(set)
     present_count = defaultdict(int)
@@ -1,12 +1,26 @@
 #!/usr/bin/env python3
 """Calculate weekly metrics for Bidding & Contract, 1st week November 2025"""
+from sqlalchemy import func as sa_func, or_
+
 from app.db import SessionLocal
 from app.models import UploadedRow
 from app.services.weekly_analysis import _parse_date, _compute_duration_hours, _get_company_short_name
 
+
+def _json_text(key):
+    """data->>'$."<key>"' as an SQL expression."""
+    return sa_func.json_unquote(sa_func.json_extract(UploadedRow.data, f'$."{key}"'))
+
+
 db = SessionLocal()
 try:
-    rows = db.query(UploadedRow).all()
+    # The group label is built from the function and company columns, so only rows where one of
+    # them mentions Bidding/Contract can match; let MySQL drop the rest. The exact checks below stay.
+    rows = db.query(UploadedRow.data).filter(or_(*(
+        _json_text(key).like(f"%{word}%")
+        for key in ("Function Name", "Company Name", "Comapny Name")
+        for word in ("Bidding", "Contract")
+    ))).all()
     
     # Filter for Bidding & Contract, 1st week November 2025 (days 1-7)
     target_records = []
@@ -1,6 +1,5 @@
 """Add per_license_cost column to teams_license table if missing."""
 from sqlalchemy import create_engine, text
-from sqlalchemy.inspection import inspect
 import os
 from dotenv import load_dotenv
 
@@ -17,15 +16,22 @@ engine = create_engine(DATABASE_URL)
 
 
 def migrate():
-    inspector = inspect(engine)
-    if "teams_license" not in inspector.get_table_names():
-        print("✓ Table teams_license does not exist yet (will be created with model)")
-        return
-    columns = [c["name"] for c in inspector.get_columns("teams_license")]
-    if "per_license_cost" in columns:
-        print("✓ Column per_license_cost already exists")
-        return
     with engine.connect() as conn:
+        # One information_schema round-trip answers both "table exists" and "column exists"
+        table_exists, column_exists = conn.execute(text("""
+            SELECT
+                EXISTS (SELECT 1 FROM information_schema.tables
+                        WHERE table_schema = DATABASE() AND table_name = 'teams_license'),
+                EXISTS (SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = DATABASE() AND table_name = 'teams_license'
+                          AND column_name = 'per_license_cost')
+        """)).one()
+        if not table_exists:
+            print("✓ Table teams_license does not exist yet (will be created with model)")
+            return
+        if column_exists:
+            print("✓ Column per_license_cost already exists")
+            return
         conn.execute(text("ALTER TABLE teams_license ADD COLUMN per_license_cost DOUBLE NULL"))
         conn.commit()
     print("✓ Added per_license_cost column to teams_license")
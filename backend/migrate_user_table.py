@@ -26,48 +26,34 @@ try:
         existing_columns = [row[0] for row in cursor.fetchall()]
         print(f"Existing columns: {existing_columns}")
         
-        # Add phone column if not exists
-        if 'phone' not in existing_columns:
-            print("Adding 'phone' column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN phone VARCHAR(20) NULL")
-            print("✓ Added 'phone' column")
+        # Columns to add if missing; all additions go into a single ALTER so
+        # MySQL rebuilds the users table once instead of once per column
+        new_columns = [
+            ("phone", "VARCHAR(20) NULL"),
+            ("department", "VARCHAR(100) NULL"),
+            ("position", "VARCHAR(100) NULL"),
+            ("permissions", "JSON NULL"),
+            ("last_login", "DATETIME NULL"),
+            # Link to employee list for data scope
+            ("employee_email", "VARCHAR(255) NULL"),
+            # N, N-1, N-2
+            ("data_scope_level", "VARCHAR(20) NULL"),
+        ]
         
-        # Add department column if not exists
-        if 'department' not in existing_columns:
-            print("Adding 'department' column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN department VARCHAR(100) NULL")
-            print("✓ Added 'department' column")
+        clauses = []
+        missing = []
+        for name, definition in new_columns:
+            if name not in existing_columns:
+                clauses.append(f"ADD COLUMN {name} {definition}")
+                missing.append(name)
+                if name == 'employee_email':
+                    clauses.append("ADD INDEX ix_users_employee_email (employee_email)")
         
-        # Add position column if not exists
-        if 'position' not in existing_columns:
-            print("Adding 'position' column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN position VARCHAR(100) NULL")
-            print("✓ Added 'position' column")
-        
-        # Add permissions column if not exists
-        if 'permissions' not in existing_columns:
-            print("Adding 'permissions' column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN permissions JSON NULL")
-            print("✓ Added 'permissions' column")
-        
-        # Add last_login column if not exists
-        if 'last_login' not in existing_columns:
-            print("Adding 'last_login' column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN last_login DATETIME NULL")
-            print("✓ Added 'last_login' column")
-        
-        # Add employee_email column if not exists (link to employee list for data scope)
-        if 'employee_email' not in existing_columns:
-            print("Adding 'employee_email' column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN employee_email VARCHAR(255) NULL")
-            cursor.execute("CREATE INDEX ix_users_employee_email ON users (employee_email)")
-            print("✓ Added 'employee_email' column")
-        
-        # Add data_scope_level column if not exists (N, N-1, N-2)
-        if 'data_scope_level' not in existing_columns:
-            print("Adding 'data_scope_level' column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN data_scope_level VARCHAR(20) NULL")
-            print("✓ Added 'data_scope_level' column")
+        if clauses:
+            print(f"Adding columns: {', '.join(missing)}...")
+            cursor.execute("ALTER TABLE users " + ", ".join(clauses))
+            for name in missing:
+                print(f"✓ Added '{name}' column")
         
         connection.commit()
         print("\n✅ Migration completed successfully!")
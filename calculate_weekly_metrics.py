@@ -4,44 +4,57 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
+from sqlalchemy import func as sa_func, or_
+
 from app.database import SessionLocal
 from app.models import UploadedRow
 from app.services.weekly_analysis import _parse_date, _compute_duration_hours
 
+
+def _json_text(key):
+    """data->>'$."<key>"' as an SQL expression."""
+    return sa_func.json_unquote(sa_func.json_extract(UploadedRow.data, f'$."{key}"'))
+
+
 db = SessionLocal()
 try:
-    rows = db.query(UploadedRow).all()
-    print(f'Total rows in database: {len(rows)}')
+    # Let MySQL drop rows whose function is not Bidding/Contract and stream the rest in
+    # batches. Dates come in several formats, so the date window is still checked below.
+    rows = db.query(UploadedRow.data).filter(or_(
+        _json_text('Function Name').like('%Bidding%'),
+        _json_text('Function Name').like('%Contract%'),
+    )).yield_per(1000)
     
     # Filter for Bidding & Contract, 1st week of November 2025
     target_records = []
-    for row in rows:
-        if not isinstance(row.data, dict):
+    total_rows = 0
+    # Raw date string -> parsed date when it falls in 1-7 November 2025, else None
+    week_dates = {}
+    for (data,) in rows:
+        total_rows += 1
+        if not isinstance(data, dict):
             continue
-        data = row.data
         
         # Check function name
         func = str(data.get('Function Name', '')).strip()
         if 'Bidding' not in func and 'Contract' not in func:
             continue
         
-        # Check date - November 2025, 1st week (days 1-7)
+        # Check date - November 2025, 1st week (days 1-7); each distinct date string is checked once
         date_str = str(data.get('Attendance Date', '')).strip()
         if not date_str:
             continue
         
-        parsed_date = _parse_date(date_str)
+        if date_str in week_dates:
+            parsed_date = week_dates[date_str]
+        else:
+            parsed_date = _parse_date(date_str)
+            if parsed_date and (parsed_date.year != 2025 or parsed_date.month != 11 or parsed_date.day > 7):
+                parsed_date = None
+            week_dates[date_str] = parsed_date
         if not parsed_date:
             continue
         
-        # Check if November 2025
-        if parsed_date.year != 2025 or parsed_date.month != 11:
-            continue
-        
-        # Check if 1st week (days 1-7)
-        if parsed_date.day < 1 or parsed_date.day > 7:
-            continue
-        
         # Get shift and work times
         shift_in = str(data.get('Shift In Time', '')).strip()
         shift_out = str(data.get('Shift Out Time', '')).strip()
@@ -64,6 +77,7 @@ try:
             'emp_name': emp_name,
         })
     
+    print(f'Bidding & Contract rows in database: {total_rows}')
     print(f'\nFound {len(target_records)} records for Bidding & Contract, 1st week November 2025')
     
     if target_records:
@@ -84,6 +98,8 @@ try:
         day_work = 0.0
         day_completed = 0
         day_lost = 0.0
+        # Per-record lines are collected and written in one call after the loop
+        out_lines = []
         
         for r in target_records:
             shift_hours = _compute_duration_hours(r['shift_in'], r['shift_out'])
@@ -107,8 +123,10 @@ try:
                     status = 'COMPLETED'
                 
                 emp_id = r['emp_code'] or r['emp_name'][:20]
-                print(f'Day {r["day"]:2d} | {r["date"][:15]:15s} | Emp: {emp_id:20s} | Shift={shift_hours:5.2f}h | Work={work_hours:5.2f}h | Flag={r["flag"]:3s} | {status}')
+                out_lines.append(f'Day {r["day"]:2d} | {r["date"][:15]:15s} | Emp: {emp_id:20s} | Shift={shift_hours:5.2f}h | Work={work_hours:5.2f}h | Flag={r["flag"]:3s} | {status}')
         
+        if out_lines:
+            sys.stdout.write('\n'.join(out_lines) + '\n')
         print('=' * 120)
         print(f'\nSUMMARY for 1st Week November 2025 - Bidding & Contract:')
         print(f'Total Work Days: {total_work_days}')
@@ -128,10 +146,9 @@ try:
         print('\nNo records found. Checking what data exists...')
         # Sample some records to see what we have
         sample_count = 0
-        for row in rows[:100]:
-            if not isinstance(row.data, dict):
+        for (data,) in db.query(UploadedRow.data).limit(100):
+            if not isinstance(data, dict):
                 continue
-            data = row.data
             func = str(data.get('Function Name', '')).strip()
             date_str = str(data.get('Attendance Date', '')).strip()
             if func and date_str:
@@ -5,13 +5,25 @@ The input file is already aggregated by Month and Function.
 import pandas as pd
 from datetime import datetime
 
+# xlsxwriter is a much faster writer than openpyxl; use it when installed
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_ENGINE = 'xlsxwriter'
+except ImportError:  # pragma: no cover
+    from openpyxl.utils import get_column_letter
+    EXCEL_ENGINE = 'openpyxl'
+
 def process_attendance_summary(input_file, output_file):
     """Process attendance summary and create function-wise summary with all months combined."""
     print(f"Reading {input_file}...")
     
-    # Read the Excel file
+    # Read the Excel file (calamine is much faster than openpyxl; fall back if pandas < 2.2
+    # or python-calamine is not installed)
     try:
-        df = pd.read_excel(input_file)
+        try:
+            df = pd.read_excel(input_file, engine='calamine')
+        except (ImportError, ValueError):
+            df = pd.read_excel(input_file)
     except Exception as e:
         print(f"Error reading file: {e}")
         return
@@ -69,23 +81,21 @@ def process_attendance_summary(input_file, output_file):
     
     # Write to Excel
     print(f"\nWriting results to {output_file}...")
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+    with pd.ExcelWriter(output_file, engine=EXCEL_ENGINE) as writer:
         result_df.to_excel(writer, sheet_name='Function Wise Summary', index=False)
         
         # Auto-adjust column widths
         worksheet = writer.sheets['Function Wise Summary']
         for idx, col in enumerate(result_df.columns):
-            # Handle column letters beyond Z (AA, AB, etc.)
-            if idx < 26:
-                col_letter = chr(65 + idx)
-            else:
-                col_letter = chr(65 + (idx // 26) - 1) + chr(65 + (idx % 26))
-            
             max_length = max(
-                result_df[col].astype(str).map(len).max() if len(result_df) > 0 else 0,
+                result_df[col].astype(str).str.len().max() if len(result_df) > 0 else 0,
                 len(str(col))
             )
-            worksheet.column_dimensions[col_letter].width = min(max_length + 2, 50)
+            width = min(max_length + 2, 50)
+            if EXCEL_ENGINE == 'xlsxwriter':
+                worksheet.set_column(idx, idx, width)
+            else:
+                worksheet.column_dimensions[get_column_letter(idx + 1)].width = width
     
     print(f"\nSummary created successfully!")
     print(f"Total functions: {len(result_df)}")